@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import sys
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable
+from sqlalchemy import and_, case, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import (ClientSuscription, DailyRevenue, LinkEvent, LinkEventKind,
+                        PlanDailyStats, PlanStats, PlanSummary, RevenueDay,
+                        StatusEnum, SubscriberDay, Suscription, Transaction,
+                        TransactionArchive, utcnow)
+from app.query_audit import query_auditor
+
+UPSERT_CHUNK = 1000
+
+# (suscription_id, status, started_at, ended_at) of a link
+LinkState = tuple[int, StatusEnum, datetime | None, datetime | None]
+
+
+def day_of(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def link_state(link: ClientSuscription) -> LinkState:
+    return (link.suscription_id, link.status, link.started_at, link.ended_at)
+
+
+async def add_counts(session: AsyncSession, model: type[SQLModel],
+                     keys: tuple[str, ...], counts: dict[tuple, Counter]) -> None:
+    """Add `counts` to the rollup rows with those keys, creating them"""
+    columns = [name for name in model.__table__.columns.keys() if name not in keys]
+    values = [{**dict(zip(keys, key)), **{name: counter[name] for name in columns}}
+              for key, counter in counts.items() if any(counter.values())]
+    for start in range(0, len(values), UPSERT_CHUNK):
+        statement = sqlite_insert(model).values(values[start:start + UPSERT_CHUNK])
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: getattr(model, name) + statement.excluded[name]
+                  for name in columns})
+        await session.exec(statement)
+
+
+def link_events(link_id: int, before: LinkState | None,
+                after: LinkState | None) -> list[dict]:
+    """The LinkEvent rows a change of link state amounts to, if any"""
+    was_active = before is not None and before[1] == StatusEnum.active
+    is_active = after is not None and after[1] == StatusEnum.active
+    if is_active and not was_active:
+        return [dict(link_id=link_id, suscription_id=after[0],
+                     kind=LinkEventKind.started, at=after[2] or utcnow())]
+    if was_active and not is_active:
+        # A deleted link churns when it is deleted
+        return [dict(link_id=link_id, suscription_id=before[0],
+                     kind=LinkEventKind.churned,
+                     at=(after[3] if after is not None else None) or utcnow())]
+    return []
+
+
+async def record_link_changes(
+        session: AsyncSession,
+        changes: Iterable[tuple[int, LinkState | None, LinkState | None]]) -> None:
+    """
+    Apply (link id, before, after) states of created, updated or deleted
+    links: PlanStats follows the current link rows, while each start or
+    churn is appended to LinkEvent and added to PlanDailyStats on its own
+    day, so past days never change. Call it before the commit that writes
+    the links.
+    """
+    plans, days, events = defaultdict(Counter), defaultdict(Counter), []
+    for link_id, before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is not None:
+                active = state[1] == StatusEnum.active
+                plans[(state[0],)]["active" if active else "inactive"] += sign
+        events += link_events(link_id, before, after)
+    for event in events:
+        days[(day_of(event["at"]), event["suscription_id"])][event["kind"].value] += 1
+    for start in range(0, len(events), UPSERT_CHUNK):
+        await session.exec(insert(LinkEvent), params=events[start:start + UPSERT_CHUNK])
+    await add_counts(session, PlanStats, ("suscription_id",), plans)
+    await add_counts(session, PlanDailyStats, ("day", "suscription_id"), days)
+
+
+async def record_revenue(session: AsyncSession, rows: Iterable[dict]) -> None:
+    """Fold new transactions into DailyRevenue (see app.ledger)"""
+    days = defaultdict(Counter)
+    now = utcnow()
+    for row in rows:
+        day = days[(day_of(row.get("created_at") or now),)]
+        day["amount"] += row["amount"] or 0
+        day["transaction_count"] += 1
+    await add_counts(session, DailyRevenue, ("day",), days)
+
+
+def ledger_rows(*columns: str):
+    """Transactions and archived transactions as one subquery"""
+    return union_all(*(select(*(getattr(model, name) for name in columns))
+                       for model in (Transaction, TransactionArchive))).subquery()
+
+
+async def remove_client_revenue(session: AsyncSession, client_id: int) -> None:
+    """Take a client's transactions, archived ones included, out of DailyRevenue"""
+    days = defaultdict(Counter)
+    for model in (Transaction, TransactionArchive):
+        for day, amount, count in (await session.exec(
+                select(func.date(model.created_at),
+                       func.coalesce(func.sum(model.amount), 0), func.count())
+                .where(model.client_id == client_id)
+                .group_by(func.date(model.created_at)))).all():
+            days[(_as_date(day),)].update(amount=-amount, transaction_count=-count)
+    await add_counts(session, DailyRevenue, ("day",), days)
+
+
+async def plan_summaries(session: AsyncSession) -> list[PlanSummary]:
+    rows = (await session.exec(
+        select(Suscription.id, Suscription.name, Suscription.price,
+               PlanStats.active, PlanStats.inactive)
+        .outerjoin(PlanStats, PlanStats.suscription_id == Suscription.id)
+        .where(Suscription.id > 0)
+        .order_by(Suscription.id))).all()
+    return [PlanSummary(suscription_id=suscription_id, name=name, price=price,
+                        active=active or 0, inactive=inactive or 0,
+                        mrr=(active or 0) * (price or 0))
+            for suscription_id, name, price, active, inactive in rows]
+
+
+def days_between(start: date, end: date) -> list[date]:
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+async def subscriber_days(session: AsyncSession, start: date, end: date,
+                          suscription_id: int | None = None) -> list[SubscriberDay]:
+    """
+    Starts, churn and active subscribers per day in [start, end]. The
+    active count is walked back from the current total, so links that
+    predate the rollups count as active all along.
+    """
+    daily = select(PlanDailyStats.day, func.sum(PlanDailyStats.started),
+                   func.sum(PlanDailyStats.churned))
+    since = select(func.coalesce(func.sum(PlanDailyStats.started
+                                          - PlanDailyStats.churned), 0))
+    current = select(func.coalesce(func.sum(PlanStats.active), 0))
+    if suscription_id is not None:
+        daily = daily.where(PlanDailyStats.suscription_id == suscription_id)
+        since = since.where(PlanDailyStats.suscription_id == suscription_id)
+        current = current.where(PlanStats.suscription_id == suscription_id)
+    else:
+        current = current.where(PlanStats.suscription_id > 0)
+    rows = {day: (started, churned) for day, started, churned in (await session.exec(
+        daily.where(PlanDailyStats.day >= start, PlanDailyStats.day <= end)
+        .group_by(PlanDailyStats.day))).all()}
+    active = ((await session.exec(current)).one()[0]
+              - (await session.exec(since.where(PlanDailyStats.day >= start))).one()[0])
+
+    result = []
+    for day in days_between(start, end):
+        started, churned = rows.get(day, (0, 0))
+        # Share of the day's subscribers, old and new, that churned
+        exposed = active + started
+        active += started - churned
+        result.append(SubscriberDay(day=day, started=started, churned=churned,
+                                    active=active,
+                                    churn_rate=churned / exposed if exposed > 0 else 0))
+    return result
+
+
+async def revenue_days(session: AsyncSession, start: date, end: date) -> list[RevenueDay]:
+    rows = {row.day: row for row in (await session.exec(
+        select(DailyRevenue).where(DailyRevenue.day >= start,
+                                   DailyRevenue.day <= end))).scalars()}
+    return [RevenueDay(day=day, amount=rows[day].amount if day in rows else 0,
+                       transaction_count=rows[day].transaction_count if day in rows else 0)
+            for day in days_between(start, end)]
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _nonzero(counts: dict[tuple, Counter]) -> dict[tuple, Counter]:
+    # Negative counts are kept: they can only come from a bad rollup
+    return {key: Counter({name: n for name, n in counter.items() if n})
+            for key, counter in counts.items() if any(counter.values())}
+
+
+async def compute_rollups(session: AsyncSession) -> dict[str, dict[tuple, Counter]]:
+    """
+    Every rollup recomputed from the base tables: plan counts from the
+    current links, daily starts and churn from LinkEvent
+    """
+    plans, days, revenue = defaultdict(Counter), defaultdict(Counter), defaultdict(Counter)
+    with query_auditor.suspended():
+        for suscription_id, active, inactive in (await session.exec(
+                select(ClientSuscription.suscription_id,
+                       func.sum(case((ClientSuscription.status == StatusEnum.active, 1),
+                                     else_=0)),
+                       func.sum(case((ClientSuscription.status == StatusEnum.active, 0),
+                                     else_=1)))
+                .group_by(ClientSuscription.suscription_id))).all():
+            plans[(suscription_id,)].update(active=active, inactive=inactive)
+        for day, suscription_id, kind, count in (await session.exec(
+                select(func.date(LinkEvent.at), LinkEvent.suscription_id,
+                       LinkEvent.kind, func.count())
+                .group_by(func.date(LinkEvent.at), LinkEvent.suscription_id,
+                          LinkEvent.kind))).all():
+            days[(_as_date(day), suscription_id)][LinkEventKind(kind).value] += count
+        ledger = ledger_rows("created_at", "amount")
+        for day, amount, count in (await session.exec(
+                select(func.date(ledger.c.created_at),
+                       func.coalesce(func.sum(ledger.c.amount), 0), func.count())
+                .group_by(func.date(ledger.c.created_at)))).all():
+            revenue[(_as_date(day),)].update(amount=amount, transaction_count=count)
+    return {"plans": _nonzero(plans), "days": _nonzero(days), "revenue": _nonzero(revenue)}
+
+
+async def stored_rollups(session: AsyncSession) -> dict[str, dict[tuple, Counter]]:
+    with query_auditor.suspended():
+        plans = {(row.suscription_id,): Counter(active=row.active, inactive=row.inactive)
+                 for row in (await session.exec(select(PlanStats))).scalars()}
+        days = {(row.day, row.suscription_id): Counter(started=row.started,
+                                                       churned=row.churned)
+                for row in (await session.exec(select(PlanDailyStats))).scalars()}
+        revenue = {(row.day,): Counter(amount=row.amount,
+                                       transaction_count=row.transaction_count)
+                   for row in (await session.exec(select(DailyRevenue))).scalars()}
+    return {"plans": _nonzero(plans), "days": _nonzero(days), "revenue": _nonzero(revenue)}
+
+
+async def verify_rollups(session: AsyncSession) -> list[str]:
+    """Differences between the rollup tables and the base tables"""
+    expected, stored = await compute_rollups(session), await stored_rollups(session)
+    mismatches = []
+    for name in expected:
+        for key in sorted(expected[name].keys() | stored[name].keys(), key=str):
+            want, have = expected[name].get(key, Counter()), stored[name].get(key, Counter())
+            if want != have:
+                mismatches.append(f"{name} {key}: expected {dict(want)}, stored {dict(have)}")
+    return mismatches
+
+
+async def rebuild_rollups(session: AsyncSession) -> None:
+    """Recompute every rollup from the base tables"""
+    expected = await compute_rollups(session)
+    for model in (PlanStats, PlanDailyStats, DailyRevenue):
+        await session.exec(delete(model))
+    await add_counts(session, PlanStats, ("suscription_id",), expected["plans"])
+    await add_counts(session, PlanDailyStats, ("day", "suscription_id"), expected["days"])
+    await add_counts(session, DailyRevenue, ("day",), expected["revenue"])
+
+
+async def backfill_link_events(session: AsyncSession) -> None:
+    """
+    Seed LinkEvent from each link's latest start and end, the only history
+    kept before it existed
+    """
+    columns = ["link_id", "suscription_id", "kind", "at"]
+    kind_type = LinkEvent.__table__.c.kind.type
+    for kind, at, condition in (
+            (LinkEventKind.started, ClientSuscription.started_at,
+             ClientSuscription.started_at.is_not(None)),
+            (LinkEventKind.churned, ClientSuscription.ended_at,
+             and_(ClientSuscription.status == StatusEnum.inactive,
+                  ClientSuscription.ended_at.is_not(None)))):
+        await session.exec(insert(LinkEvent).from_select(columns, select(
+            ClientSuscription.id, ClientSuscription.suscription_id,
+            literal(kind, kind_type), at).where(condition)))
+
+
+async def ensure_rollups(session: AsyncSession) -> None:
+    """
+    Backfill the link history and the rollups for a database whose links
+    and transactions predate them
+    """
+    has_links = (await session.exec(select(func.max(ClientSuscription.id)))).one()[0]
+    has_events = (await session.exec(select(func.max(LinkEvent.id)))).one()[0]
+    if has_links is not None and has_events is None:
+        await backfill_link_events(session)
+        await session.commit()
+    has_transactions = (await session.exec(select(func.max(Transaction.id)))).one()[0]
+    has_plans = (await session.exec(select(func.max(PlanStats.suscription_id)))).one()[0]
+    has_revenue = (await session.exec(select(func.max(DailyRevenue.day)))).one()[0]
+    if ((has_links is not None or has_transactions is not None)
+            and has_plans is None and has_revenue is None):
+        await rebuild_rollups(session)
+        await session.commit()
+
+
+def main() -> None:
+    """
+        python -m app.analytics verify
+        python -m app.analytics rebuild
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.analytics")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+    from app.db import new_session
+    from main import app, lifespan
+
+    async def run() -> list[str]:
+        async with lifespan(app), new_session() as session:
+            if args.command == "rebuild":
+                await rebuild_rollups(session)
+                await session.commit()
+            return await verify_rollups(session)
+
+    mismatches = asyncio.run(run())
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"{len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
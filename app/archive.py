@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import logging
+from contextlib import suppress
+from sqlalchemy import delete, insert, literal, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.analytics import record_link_changes, remove_client_revenue
+from app.changes import record_changes, record_changes_where
+from app.db import current_tenant, new_session
+from app.models import (ArchiveJob, ChangeAction, Client, ClientBalance,
+                        ClientSuscription, StatusEnum, Transaction,
+                        TransactionArchive, utcnow)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# The columns of app.analytics.LinkState, preceded by the link id
+LINK_COLUMNS = (ClientSuscription.id, ClientSuscription.suscription_id,
+                ClientSuscription.status, ClientSuscription.started_at,
+                ClientSuscription.ended_at)
+
+
+async def purge_client(session: AsyncSession, client: Client) -> None:
+    """
+    Delete a client with its links, transactions (archived ones too),
+    balance and archive job, one statement per table whatever the size of
+    its history. Rollups and the change log are adjusted in the same
+    transaction; the caller commits.
+    """
+    links = (await session.exec(select(*LINK_COLUMNS)
+                                .where(ClientSuscription.client_id == client.id))).all()
+    await record_link_changes(session, [(link_id, tuple(state), None)
+                                        for link_id, *state in links])
+    await record_changes(session, ClientSuscription, ChangeAction.delete,
+                         [link_id for link_id, *_ in links])
+    await remove_client_revenue(session, client.id)
+    await record_changes_where(session, Transaction, ChangeAction.delete,
+                               Transaction.client_id == client.id)
+    if client.deleted_at is None:
+        # A soft delete already logged it
+        await record_changes(session, Client, ChangeAction.delete, [client.id])
+    for model in (Transaction, TransactionArchive, ClientSuscription,
+                  ClientBalance, ArchiveJob):
+        await session.exec(delete(model).where(model.client_id == client.id))
+    await session.exec(delete(Client).where(Client.id == client.id))
+
+
+async def soft_delete_client(session: AsyncSession, client: Client) -> None:
+    """
+    Flag a client as deleted, end its active subscriptions and queue the
+    archival of its transactions (see `archive_client`). Costs the same
+    however many transactions it has; the caller commits.
+    """
+    now = utcnow()
+    links = (await session.exec(select(*LINK_COLUMNS).where(
+        ClientSuscription.client_id == client.id,
+        ClientSuscription.status == StatusEnum.active))).all()
+    link_ids = [link_id for link_id, *_ in links]
+    if link_ids:
+        await session.exec(update(ClientSuscription)
+                           .where(ClientSuscription.id.in_(link_ids))
+                           .values(status=StatusEnum.inactive, ended_at=now))
+    await record_link_changes(
+        session, [(link_id, (suscription_id, status, started_at, ended_at),
+                   (suscription_id, StatusEnum.inactive, started_at, now))
+                  for link_id, suscription_id, status, started_at, ended_at in links])
+    await record_changes(session, ClientSuscription, ChangeAction.update, link_ids)
+    await record_changes(session, Client, ChangeAction.delete, [client.id])
+    await session.exec(update(Client).where(Client.id == client.id)
+                       .values(deleted_at=now))
+    await session.exec(insert(ArchiveJob).values(client_id=client.id, started_at=now))
+
+
+async def archive_batch(client_id: int, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move up to `batch_size` of a soft-deleted client's transactions to
+    TransactionArchive and log their deletes, in one database transaction.
+    Balances and revenue rollups still count them. Returns how many moved;
+    the job completes with the first short batch.
+    """
+    async with new_session() as session:
+        ids = (await session.exec(select(Transaction.id)
+                                  .where(Transaction.client_id == client_id)
+                                  .limit(batch_size))).scalars().all()
+        now = utcnow()
+        progress = {"archived": ArchiveJob.archived + len(ids)}
+        if len(ids) < batch_size:
+            progress.update(status="completed", finished_at=now)
+        job = await session.exec(update(ArchiveJob)
+                                 .where(ArchiveJob.client_id == client_id,
+                                        ArchiveJob.status == "running")
+                                 .values(**progress))
+        if job.rowcount == 0:
+            # Completed, or the client was purged meanwhile
+            await session.rollback()
+            return 0
+        if ids:
+            columns = list(Transaction.__table__.columns.keys())
+            await session.exec(insert(TransactionArchive).from_select(
+                columns + ["archived_at"],
+                select(*(Transaction.__table__.c[name] for name in columns),
+                       literal(now, TransactionArchive.__table__.c.archived_at.type))
+                .where(Transaction.id.in_(ids))))
+            await session.exec(delete(Transaction).where(Transaction.id.in_(ids)))
+            await record_changes(session, Transaction, ChangeAction.delete, ids)
+        await session.commit()
+    return len(ids)
+
+
+async def archive_client(client_id: int, batch_size: int = ARCHIVE_BATCH_SIZE) -> None:
+    """Archive a soft-deleted client's transactions, one batch at a time"""
+    while await archive_batch(client_id, batch_size) == batch_size:
+        # Let requests in between batches
+        await asyncio.sleep(0)
+
+
+class Archiver:
+    """
+    Runs the archivals of soft-deleted clients on a task of its own, one
+    client at a time, so they count towards no request. Started with the
+    app, it first queues the jobs a restart left running; tenant shards
+    are resumed the first time this process opens them (see main).
+    """
+
+    def __init__(self, batch_size: int = ARCHIVE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.resumed = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        await self.resume()
+
+    async def stop(self) -> None:
+        """Stop; a batch cut short rolls back and its job resumes on the next start"""
+        if not self.running:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def resume(self, tenant: str | None = None) -> None:
+        """Queue the archivals left running in the database of `tenant`"""
+        token = current_tenant.set(tenant)
+        try:
+            async with new_session(read_only=True) as session:
+                client_ids = (await session.exec(
+                    select(ArchiveJob.client_id)
+                    .where(ArchiveJob.status == "running"))).scalars().all()
+        finally:
+            current_tenant.reset(token)
+        for client_id in client_ids:
+            self._queue.put_nowait((tenant, client_id))
+        self.resumed += len(client_ids)
+
+    def submit(self, client_id: int) -> None:
+        """
+        Archive a soft-deleted client of the current tenant. While stopped
+        the job stays running and is resumed by the next start.
+        """
+        if self.running:
+            self._queue.put_nowait((current_tenant.get(), client_id))
+
+    async def join(self) -> None:
+        """Wait for every queued archival"""
+        if self.running:
+            await self._queue.join()
+
+    async def _run(self) -> None:
+        while True:
+            tenant, client_id = await self._queue.get()
+            token = current_tenant.set(tenant)
+            try:
+                await archive_client(client_id, self.batch_size)
+            except Exception:
+                logger.exception("Archiving client %s failed", client_id)
+            finally:
+                current_tenant.reset(token)
+                self._queue.task_done()
+
+
+archiver = Archiver()
+
+
+def main() -> None:
+    """
+    Resume archivals cut short by a restart:
+
+        python -m app.archive --batch-size 1000
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.archive")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+    from main import app, lifespan
+
+    archiver.batch_size = args.batch_size
+
+    async def run() -> int:
+        # Starting the app resumes them
+        async with lifespan(app):
+            await archiver.join()
+        return archiver.resumed
+
+    print(f"Archived {asyncio.run(run())} clients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+from functools import lru_cache
+from typing import Annotated
+from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from app.cache import TTLCache
+from app.config import get_settings
+from app.db import current_tenant, new_session, open_session, tenant_engines
+from app.models import User, UserCreate
+
+# scrypt cost: ~50ms and 16 MiB per hash, which is what the cache amortizes
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    key = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return "$".join(["scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P),
+                     base64.b64encode(salt).decode(), base64.b64encode(key).decode()])
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    try:
+        scheme, n, r, p, salt, expected = password_hash.split("$")
+    except ValueError:
+        return False
+    if scheme != "scrypt":
+        return False
+    key = hashlib.scrypt(password.encode(), salt=base64.b64decode(salt),
+                         n=int(n), r=int(r), p=int(p))
+    return hmac.compare_digest(key, base64.b64decode(expected))
+
+
+@lru_cache
+def dummy_hash() -> str:
+    """
+    Verified against when the username does not exist, so unknown and
+    known users take the same time to reject
+    """
+    return hash_password(secrets.token_urlsafe())
+
+
+class CredentialCache:
+    """
+    Recently verified credentials, so repeat callers skip the password hash.
+
+    Entries are keyed by tenant and username and hold an HMAC of username and password
+    under a per-process random key, compared in constant time; the plain
+    password is never stored. Call `invalidate(username)` when a password
+    changes. Changes made by other workers are picked up after `ttl`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._key = secrets.token_bytes(32)
+
+    def digest(self, username: str, password: str) -> bytes:
+        message = username.encode() + b"\0" + password.encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def get(self, username: str, password: str) -> int | None:
+        entry = self.entries.get((current_tenant.get(), username))
+        if entry is None:
+            return None
+        user_id, digest = entry
+        if hmac.compare_digest(digest, self.digest(username, password)):
+            return user_id
+        return None
+
+    def set(self, username: str, password: str, user_id: int) -> None:
+        self.entries.set((current_tenant.get(), username), (user_id, self.digest(username, password)))
+
+    def invalidate(self, username: str | None = None) -> None:
+        if username is None:
+            self.entries.clear()
+        else:
+            self.entries.pop((current_tenant.get(), username))
+
+
+credential_cache = CredentialCache(maxsize=get_settings().auth_cache_size,
+                                   ttl=get_settings().auth_cache_ttl)
+security = HTTPBasic(auto_error=False)
+
+
+def unauthorized() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                         detail="Invalid credentials",
+                         headers={"WWW-Authenticate": "Basic"})
+
+
+async def authenticate(credentials: HTTPBasicCredentials) -> int:
+    """
+    Return the id of the user the credentials belong to, or raise a 401.
+    The database is only opened when the credential cache misses.
+    """
+    user_id = credential_cache.get(credentials.username, credentials.password)
+    if user_id is not None:
+        return user_id
+    async with await open_session(read_only=True) as session:
+        user = (await session.exec(
+            select(User).where(User.username == credentials.username))).first()
+    # scrypt is CPU bound; keep it off the event loop
+    valid = await run_in_threadpool(verify_password, credentials.password,
+                                    user.password_hash if user else dummy_hash())
+    if not user or not valid:
+        raise unauthorized()
+    credential_cache.set(credentials.username, credentials.password, user.id)
+    return user.id
+
+
+async def require_user(
+        credentials: Annotated[HTTPBasicCredentials | None, Depends(security)]
+        ) -> int | None:
+    """
+    Router-wide HTTP Basic check; a no-op unless AUTH_ENABLED is set
+    """
+    if not get_settings().auth_enabled:
+        return None
+    if credentials is None:
+        raise unauthorized()
+    return await authenticate(credentials)
+
+
+UserDep = Annotated[int | None, Depends(require_user)]
+
+
+async def require_admin(user_id: UserDep) -> int | None:
+    """
+    Admin routes read every tenant, so only users of the default database
+    may call them: requests scoped to a tenant get a 403
+    """
+    if current_tenant.get() is not None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Admin routes are not available to tenants")
+    return user_id
+
+
+async def create_user(username: str, password: str, tenant: str | None = None) -> int:
+    """
+    Add a user to the default database or a tenant's shard and return its
+    id. Users are only created here, from the command line below: there
+    is no route for it, so nobody can sign themselves up. Raises
+    pydantic's ValidationError for a short password and IntegrityError
+    for a taken username.
+    """
+    user_data = UserCreate(username=username, password=password)
+    if tenant is not None:
+        await tenant_engines.ensure(tenant)
+    token = current_tenant.set(tenant)
+    try:
+        async with new_session() as session:
+            user = User(username=user_data.username,
+                        password_hash=await run_in_threadpool(hash_password,
+                                                              user_data.password))
+            session.add(user)
+            await session.commit()
+            return user.id
+    finally:
+        current_tenant.reset(token)
+
+
+def main() -> None:
+    """
+    Create users, the first of which is needed once AUTH_ENABLED is on:
+
+        python -m app.auth create-user admin
+        python -m app.auth create-user admin --tenant acme
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.auth")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create-user")
+    create.add_argument("username")
+    create.add_argument("--password", help="prompted for when omitted")
+    create.add_argument("--tenant", help="create the user in this tenant's shard")
+    args = parser.parse_args()
+
+    password = args.password
+    if password is None:
+        import getpass
+        password = getpass.getpass()
+    from main import app, lifespan
+
+    async def run():
+        async with lifespan(app):
+            await create_user(args.username, password, args.tenant)
+
+    try:
+        asyncio.run(run())
+    except ValidationError as exc:
+        parser.error("; ".join(error["msg"] for error in exc.errors()))
+    except IntegrityError:
+        parser.error(f"username {args.username} already exists")
+    print(f"Created user {args.username}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+from typing import AsyncIterator, Awaitable, Callable
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import BulkError, BulkResult
+
+CHUNK_SIZE = 1000
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+
+
+def row_error(index: int, msg: str, loc: tuple = ()) -> BulkError:
+    return BulkError(index=index, errors=[{"type": "value_error",
+                                           "loc": list(loc), "msg": msg}])
+
+
+async def read_rows(request: Request) -> AsyncIterator[tuple[int, object]]:
+    """
+    Yield (index, row) from a JSON array body, or line by line from an
+    NDJSON body without buffering the whole upload
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in NDJSON_TYPES:
+        try:
+            rows = json.loads(await request.body())
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Body must be a JSON array or NDJSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Body must be a JSON array or NDJSON")
+        for index, row in enumerate(rows):
+            yield index, row
+        return
+
+    index = 0
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, _parse_line(buffer)
+
+
+def _parse_line(line: bytes) -> object:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as exc:
+        return exc
+
+
+async def validated_chunks(request: Request, model: type[SQLModel],
+                           result: BulkResult,
+                           chunk_size: int = CHUNK_SIZE
+                           ) -> AsyncIterator[list[tuple[int, SQLModel]]]:
+    """
+    Validate rows against `model`, recording failures in `result`, and
+    yield the valid ones in chunks of `chunk_size`
+    """
+    chunk = []
+    async for index, row in read_rows(request):
+        if isinstance(row, json.JSONDecodeError):
+            result.errors.append(row_error(index, f"Invalid JSON: {row.msg}"))
+            continue
+        try:
+            chunk.append((index, model.model_validate(row)))
+        except ValidationError as exc:
+            result.errors.append(BulkError(index=index, errors=jsonable_encoder(
+                exc.errors(include_url=False, include_context=False))))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def insert_chunk(session: AsyncSession, table: type[SQLModel],
+                       rows: list[tuple[int, dict]], result: BulkResult,
+                       conflict: str, conflict_loc: tuple = (),
+                       before_commit: Callable[[list[dict]], Awaitable] | None = None
+                       ) -> list[dict]:
+    """
+    Insert a chunk with one executemany and commit it. If a concurrent
+    writer makes the chunk violate a constraint, retry row by row under
+    savepoints so only the conflicting rows are reported, as `conflict`
+    at `conflict_loc` like the callers' own checks. `before_commit`
+    receives the inserted rows, with their new ids, inside the same
+    database transaction. Returns the inserted rows.
+    """
+    if not rows:
+        return []
+    statement = insert(table).returning(table.id, sort_by_parameter_order=True)
+    try:
+        ids = (await session.exec(statement, params=[row for _, row in rows])).scalars()
+        inserted = [{**row, "id": row_id} for (_, row), row_id in zip(rows, ids)]
+        if before_commit:
+            await before_commit(inserted)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        inserted = []
+        for index, row in rows:
+            try:
+                async with session.begin_nested():
+                    row_id = (await session.exec(statement, params=[row])).scalar_one()
+                inserted.append({**row, "id": row_id})
+            except IntegrityError:
+                result.errors.append(row_error(index, conflict, conflict_loc))
+        if before_commit and inserted:
+            await before_commit(inserted)
+        await session.commit()
+    result.inserted += len(inserted)
+    return inserted
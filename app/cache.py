@@ -0,0 +1,125 @@
+import functools
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.db import current_tenant
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU mapping whose entries also expire `ttl` seconds after
+    they were stored.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, MISSING)
+        if entry is MISSING or entry[0] < time.monotonic():
+            if entry is not MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: dict[str, str]
+
+
+class ResponseCache:
+    """
+    In-process cache of serialized JSON responses for read-mostly routes.
+
+    Decorate the endpoint (it must accept `request: Request`) and call
+    `invalidate()` after any commit that changes the data. Responses carry
+    a strong ETag, and a matching If-None-Match is answered with 304
+    without running the endpoint. Each tenant has its own entries.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 300):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def invalidate(self) -> None:
+        self.entries.clear()
+
+    def __call__(self, endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            key = (current_tenant.get(), request.url.path, str(request.query_params))
+            cached = self.entries.get(key)
+            if cached is None:
+                result = await endpoint(*args, **kwargs)
+                if isinstance(result, StreamingResponse):
+                    return result
+                headers = {}
+                if isinstance(result, Response):
+                    # Already encoded, e.g. by the fast JSON path
+                    if result.status_code != status.HTTP_200_OK:
+                        return result
+                    body = bytes(result.body)
+                    headers.update(result.headers)
+                else:
+                    body = json.dumps(jsonable_encoder(result), separators=(",", ":"),
+                                      ensure_ascii=False).encode()
+                    for value in kwargs.values():
+                        if isinstance(value, Response):
+                            headers.update(value.headers)
+                headers.pop("content-length", None)
+                headers.pop("content-type", None)
+                cached = CachedResponse(body=body, etag=make_etag(body),
+                                        headers=headers)
+                self.entries.set(key, cached)
+            headers = {**cached.headers, "ETag": cached.etag}
+            if etag_matches(request.headers.get("if-none-match"), cached.etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                                headers=headers)
+            return Response(content=cached.body, media_type="application/json",
+                            headers=headers)
+
+        return wrapper
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from typing import Iterable
+from sqlalchemy import insert, literal, select
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.dependencies import chunked
+from app.models import (Change, ChangeAction, ChangeFeed, ChangeLog, Client,
+                        ClientSuscription, Transaction, not_deleted, utcnow)
+from app.pagination import encode_cursor
+from app.serializers import row_encoder
+
+TRACKED = {model.__tablename__: model
+           for model in (Client, ClientSuscription, Transaction)}
+
+
+async def record_changes(session: AsyncSession, model: type[SQLModel],
+                         action: ChangeAction, ids: Iterable[int]) -> None:
+    """
+    Append one ChangeLog entry per id. Call it before the commit of the
+    write it describes, so the log never misses or invents a change.
+    """
+    now = utcnow()
+    rows = [{"entity": model.__tablename__, "entity_id": entity_id,
+             "action": action, "changed_at": now} for entity_id in ids]
+    if rows:
+        await session.exec(insert(ChangeLog), params=rows)
+
+
+async def record_changes_where(session: AsyncSession, model: type[SQLModel],
+                               action: ChangeAction, *criteria) -> None:
+    """
+    Like `record_changes` for every row of `model` matching `criteria`,
+    in one INSERT ... SELECT however many rows match
+    """
+    columns = ChangeLog.__table__.c
+    await session.exec(insert(ChangeLog).from_select(
+        ["entity", "entity_id", "action", "changed_at"],
+        select(literal(model.__tablename__, columns.entity.type), model.id,
+               literal(action, columns.action.type),
+               literal(utcnow(), columns.changed_at.type))
+        .where(*criteria).order_by(model.id)))
+
+
+async def current_rows(session: AsyncSession,
+                       entries: list[ChangeLog]) -> dict[tuple[str, int], dict]:
+    """Current state of the changed rows, one IN query per entity and chunk"""
+    ids = defaultdict(set)
+    for entry in entries:
+        ids[entry.entity].add(entry.entity_id)
+    rows = {}
+    for entity, entity_ids in ids.items():
+        model = TRACKED[entity]
+        encoder = row_encoder(model)
+        for chunk in chunked(sorted(entity_ids)):
+            found = (await session.exec(encoder.query()
+                                        .where(model.id.in_(chunk), *not_deleted(model)))).all()
+            for row in encoder.rows_to_dicts(found):
+                rows[(entity, row["id"])] = row
+    return rows
+
+
+async def read_changes(session: AsyncSession, since: int, limit: int) -> ChangeFeed:
+    """
+    Log entries after the `since` id, oldest first, with the current
+    state of each row. Costs O(limit) whatever the size of the tables.
+    """
+    entries = (await session.exec(
+        select(ChangeLog).where(ChangeLog.id > since)
+        .order_by(ChangeLog.id).limit(limit))).scalars().all()
+    rows = await current_rows(session, entries)
+    return ChangeFeed(
+        changes=[Change(id=entry.id, entity=entry.entity, entity_id=entry.entity_id,
+                        action=entry.action, changed_at=entry.changed_at,
+                        data=rows.get((entry.entity, entry.entity_id)))
+                 for entry in entries],
+        next=encode_cursor(entries[-1].id if entries else since))
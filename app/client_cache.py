@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from sqlalchemy import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.cache import MISSING, TTLCache
+from app.config import get_settings
+from app.db import current_tenant, new_session
+from app.metrics import metrics
+from app.models import ChangeLog, Client, not_deleted
+from app.serializers import row_encoder
+
+logger = logging.getLogger(__name__)
+
+# Change log rows read per query while syncing
+SYNC_BATCH_SIZE = 1000
+
+
+class ClientCache:
+    """
+    Process-wide read-through cache of clients by id, holding the JSON of
+    the client, for GET /clients/{client_id} and the balance check.
+
+    Writers call `invalidate(client_id)` after their commit. Other workers'
+    writes are picked up by `start_sync`, which polls the change log, or
+    else after `ttl`; only the default database's log is polled, so
+    tenant shards rely on the ttl. Unknown ids are cached as None only
+    while the sync runs, as a client created by another worker would
+    otherwise stay missing for `ttl`. Entries are keyed by tenant and id.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60, enabled: bool = True):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.enabled = enabled
+        self.last_change_id = 0
+        # Bumped by every invalidation; a read that raced one is not cached
+        self._generation = 0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def syncing(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def get(self, session: AsyncSession, client_id: int) -> bytes | None:
+        """JSON of the client, or None if it does not exist"""
+        key = (current_tenant.get(), client_id)
+        if self.enabled:
+            cached = self.entries.get(key, MISSING)
+            if cached is not MISSING:
+                return cached
+        generation = self._generation
+        encoder = row_encoder(Client)
+        row = (await session.exec(encoder.query().where(Client.id == client_id,
+                                                        *not_deleted(Client)))).first()
+        body = encoder.encode_one(row) if row else None
+        cacheable = body is not None or (self.syncing and key[0] is None)
+        if self.enabled and cacheable and generation == self._generation:
+            self.entries.set(key, body)
+        return body
+
+    async def exists(self, session: AsyncSession, client_id: int) -> bool:
+        return await self.get(session, client_id) is not None
+
+    def invalidate(self, client_id: int | None = None) -> None:
+        self._generation += 1
+        if client_id is None:
+            self.entries.clear()
+        else:
+            self.entries.pop((current_tenant.get(), client_id))
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.entries.hits + self.entries.misses
+        return self.entries.hits / lookups if lookups else 0.0
+
+    def render_metrics(self) -> list[str]:
+        return ["# HELP client_cache_hits_total Client cache lookups answered from memory",
+                "# TYPE client_cache_hits_total counter",
+                f"client_cache_hits_total {self.entries.hits}",
+                "# HELP client_cache_misses_total Client cache lookups that read the database",
+                "# TYPE client_cache_misses_total counter",
+                f"client_cache_misses_total {self.entries.misses}",
+                "# HELP client_cache_entries Clients currently cached",
+                "# TYPE client_cache_entries gauge",
+                f"client_cache_entries {len(self.entries)}"]
+
+    async def poll_changes(self) -> None:
+        """Drop the clients changed in the change log since the last poll"""
+        async with new_session(read_only=True) as session:
+            while True:
+                changes = (await session.exec(
+                    select(ChangeLog.id, ChangeLog.entity_id)
+                    .where(ChangeLog.entity == Client.__tablename__,
+                           ChangeLog.id > self.last_change_id)
+                    .order_by(ChangeLog.id).limit(SYNC_BATCH_SIZE))).all()
+                for change_id, client_id in changes:
+                    self.invalidate(client_id)
+                    self.last_change_id = change_id
+                if len(changes) < SYNC_BATCH_SIZE:
+                    break
+
+    async def start_sync(self, interval_ms: float) -> None:
+        async with new_session(read_only=True) as session:
+            self.last_change_id = (await session.exec(
+                select(func.max(ChangeLog.id)))).one()[0] or 0
+        self._task = asyncio.create_task(self._sync(interval_ms / 1000))
+
+    async def stop_sync(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sync(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.poll_changes()
+            except Exception:
+                # Stale entries still expire after ttl
+                logger.exception("Client cache sync failed")
+
+
+client_cache = ClientCache(maxsize=get_settings().client_cache_size,
+                           ttl=get_settings().client_cache_ttl,
+                           enabled=get_settings().client_cache)
+metrics.collectors.append(client_cache.render_metrics)
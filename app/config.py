@@ -0,0 +1,67 @@
+import os
+from functools import lru_cache
+from pydantic import BaseModel
+
+
+class Settings(BaseModel):
+    """
+    Application settings. Every field can be overridden with an environment
+    variable of the same name in upper case, e.g. DATABASE_URL or POOL_SIZE.
+    """
+    database_url: str = "sqlite+aiosqlite:///./db.sqlite3"
+    # Separate engine for GET handlers; defaults to database_url
+    read_database_url: str | None = None
+    read_engine: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    echo: bool = False
+
+    # SQLite pragmas applied on every new connection
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+
+    email_lookup_cache: bool = True
+    # Encode list responses from row tuples with orjson, bypassing Pydantic
+    fast_json: bool = False
+    # Plan catalog response cache
+    catalog_cache_ttl: float = 300
+    catalog_cache_size: int = 128
+    # Serialized clients by id for GET /clients/{id} and existence checks;
+    # with sync on, each worker polls the change log for others' writes
+    client_cache: bool = True
+    client_cache_ttl: float = 60
+    client_cache_size: int = 10_000
+    client_cache_sync_ms: float = 0
+    # Fail any SELECT that SQLite plans as a full table scan
+    query_plan_audit: bool = False
+    # Request/SQL metrics at /metrics; log requests slower than this (0 = off)
+    metrics: bool = True
+    slow_request_ms: float = 0
+
+    # One database per tenant, chosen by the X-Tenant-ID header: a URL with
+    # a {tenant} placeholder; at most tenant_engine_cache_size engines open
+    tenant_database_url: str | None = None
+    tenant_engine_cache_size: int = 32
+
+    # Coalesce single-row writes into group commits on one writer task
+    write_queue: bool = False
+    write_queue_max_batch: int = 64
+    write_queue_max_delay_ms: float = 2
+    # HTTP Basic auth on every router; verified credentials cached in memory
+    auth_enabled: bool = False
+    auth_cache_ttl: float = 300
+    auth_cache_size: int = 1024
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(**{name: os.environ[name.upper()]
+                      for name in cls.model_fields
+                      if name.upper() in os.environ})
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings.from_env()
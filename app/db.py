@@ -1,22 +1,280 @@
-from typing import Annotated, Generator
-from sqlmodel import Session, SQLModel, create_engine
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Annotated, AsyncGenerator, Awaitable, Callable
+from sqlalchemy import delete, event, func, inspect, insert, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from contextlib import asynccontextmanager
-from fastapi import Depends
+from fastapi import Depends, HTTPException, status
+from app.config import Settings, get_settings
+from app.models import SchemaFingerprint
+from app.query_audit import query_auditor
 
-# Create SQLite engine
-DATABASE_URL = "sqlite:///./db.sqlite3"
-engine = create_engine(DATABASE_URL, echo=True)
+logger = logging.getLogger(__name__)
 
-# Session dependency
-def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+
+def apply_sqlite_pragmas(dbapi_connection, settings: Settings,
+                         read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    if settings.sqlite_wal and not read_only:
+        # WAL lets readers proceed while a writer holds the lock
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    # Negative values are in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def build_engine(url: str, settings: Settings,
+                 read_only: bool = False) -> AsyncEngine:
+    url = make_url(url)
+    sqlite = url.get_backend_name() == "sqlite"
+    kwargs = {"echo": settings.echo}
+    if not (sqlite and url.database in (None, "", ":memory:")):
+        kwargs.update(pool_size=settings.pool_size,
+                      max_overflow=settings.max_overflow)
+    engine = create_async_engine(url, **kwargs)
+    if sqlite:
+        @event.listens_for(engine.sync_engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, settings, read_only)
+    return engine
+
+
+# Engines are built on first use, so importing the app opens nothing
+@lru_cache
+def get_engine() -> AsyncEngine:
+    settings = get_settings()
+    return build_engine(settings.database_url, settings)
+
+@lru_cache
+def get_read_engine() -> AsyncEngine:
+    # GET handlers read through the read engine so reads scale apart from writes
+    settings = get_settings()
+    if settings.read_engine or settings.read_database_url:
+        return build_engine(settings.read_database_url or settings.database_url,
+                            settings, read_only=True)
+    return get_engine()
+
+# Tenant of the current request, set by app.tenants.TenantMiddleware
+current_tenant: ContextVar[str | None] = ContextVar("current_tenant", default=None)
+
+
+class UnknownTenantError(LookupError):
+    pass
+
+
+def tenant_url(tenant: str) -> str:
+    return get_settings().tenant_database_url.format(tenant=tenant)
+
+
+def tenant_exists(tenant: str) -> bool:
+    url = make_url(tenant_url(tenant))
+    # Connecting would create a missing SQLite file; shards are made by the CLI
+    return url.get_backend_name() != "sqlite" or os.path.exists(url.database or "")
+
+
+class TenantEngines:
+    """
+    Engines of the tenant shards, built on first use and kept in LRU
+    order; the least recently used one is disposed beyond `maxsize`, so
+    idle tenants do not hold connection pools. Reads and writes of a
+    tenant share its engine.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        # Called with each new engine, e.g. to instrument it (see main)
+        self.hooks: list[Callable[[AsyncEngine], None]] = []
+        # Awaited with each tenant whose shard this process opens, once migrated
+        self.open_hooks: list[Callable[[str], Awaitable]] = []
+        self._engines: OrderedDict[str, AsyncEngine] = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def __contains__(self, tenant: str) -> bool:
+        return tenant in self._engines
+
+    def __len__(self) -> int:
+        return len(self._engines)
+
+    def get(self, tenant: str) -> AsyncEngine:
+        engine = self._engines.get(tenant)
+        if engine is None:
+            engine = self._engines[tenant] = build_engine(tenant_url(tenant), get_settings())
+            for hook in self.hooks:
+                hook(engine)
+            while len(self._engines) > self.maxsize:
+                _, evicted = self._engines.popitem(last=False)
+                # Checked-out connections finish their work; idle ones close
+                asyncio.get_running_loop().create_task(evicted.dispose())
+        self._engines.move_to_end(tenant)
+        return engine
+
+    async def ensure(self, tenant: str) -> AsyncEngine:
+        """
+        The tenant's engine, migrating the shard the first time it is
+        opened by this process. Raises UnknownTenantError for no shard.
+        """
+        if tenant in self._engines:
+            return self.get(tenant)
+        async with self._lock:
+            if tenant not in self._engines:
+                if not tenant_exists(tenant):
+                    raise UnknownTenantError(tenant)
+                async with self.get(tenant).begin() as conn:
+                    await conn.run_sync(migrate_schema)
+                for hook in self.open_hooks:
+                    await hook(tenant)
+        return self.get(tenant)
+
+    async def dispose(self) -> None:
+        while self._engines:
+            _, engine = self._engines.popitem()
+            await engine.dispose()
+
+
+tenant_engines = TenantEngines(maxsize=get_settings().tenant_engine_cache_size)
+
+
+def new_session(read_only: bool = False) -> AsyncSession:
+    """Session outside of a request, e.g. for streamed responses"""
+    tenant = current_tenant.get()
+    if tenant is not None:
+        return AsyncSession(tenant_engines.get(tenant), expire_on_commit=False)
+    return AsyncSession(get_read_engine() if read_only else get_engine(),
+                        expire_on_commit=False)
+
+async def open_session(read_only: bool = False) -> AsyncSession:
+    """
+    new_session for request handling: the tenant's shard is opened, and
+    migrated, on first use, so a request rejected before it needs the
+    database (by auth, for one) opens no engine
+    """
+    tenant = current_tenant.get()
+    if tenant is not None:
+        try:
+            await tenant_engines.ensure(tenant)
+        except UnknownTenantError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail="Tenant not found")
+    return new_session(read_only)
+
+# Session dependencies
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with await open_session() as session:
+        yield session
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with await open_session(read_only=True) as session:
         yield session
 
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+
+def add_missing_columns(conn) -> None:
+    # create_all never alters existing tables; new columns are nullable
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" '
+                                  f'ADD COLUMN "{column.name}" {column_type}'))
+
+class DuplicateValuesError(RuntimeError):
+    pass
+
+
+def check_unique(conn, index) -> None:
+    """
+    Raise DuplicateValuesError naming the values that would stop a new
+    unique index from being created on an existing table
+    """
+    columns = list(index.columns)
+    with query_auditor.suspended():
+        duplicates = conn.execute(select(*columns).group_by(*columns)
+                                  .having(func.count() > 1).limit(10)).all()
+    if duplicates:
+        values = ", ".join(str(row[0] if len(row) == 1 else tuple(row))
+                           for row in duplicates)
+        raise DuplicateValuesError(
+            f"Cannot create unique index {index.name}: {index.table.name} has "
+            f"duplicate {', '.join(column.name for column in columns)} values "
+            f"({values}); merge or delete the duplicate rows and restart")
+
+
+def create_missing_indexes(conn) -> None:
+    # create_all only adds indexes together with new tables
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                check_unique(conn, index)
+            index.create(conn)
+
+def schema_fingerprint(dialect) -> str:
+    """
+    Hash of the DDL create_all would emit, plus the raw DDL modules add to
+    metadata.info["ddl"], so any change to the models alters it
+    """
+    digest = hashlib.sha256()
+    for table in SQLModel.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for statement in SQLModel.metadata.info.get("ddl", ()):
+        digest.update(statement.encode())
+    return digest.hexdigest()
+
+def migrate_schema(conn) -> bool:
+    """
+    Create missing tables, columns and indexes, unless the database
+    records the current schema fingerprint. Returns whether it ran.
+    """
+    fingerprint = schema_fingerprint(conn.dialect)
+    try:
+        if conn.execute(select(SchemaFingerprint.fingerprint)
+                        .where(SchemaFingerprint.fingerprint == fingerprint)).first():
+            return False
+    except OperationalError:
+        pass  # A new database, or one that predates the fingerprint table
+    SQLModel.metadata.create_all(conn)
+    add_missing_columns(conn)
+    create_missing_indexes(conn)
+    conn.execute(delete(SchemaFingerprint))
+    conn.execute(insert(SchemaFingerprint).values(fingerprint=fingerprint))
+    return True
 
 @asynccontextmanager
 async def create_all_tables(app):
-    # Create tables on startup
-    SQLModel.metadata.create_all(engine)
+    # Create tables on startup; app.state.schema_migrated tells whether it had to
+    engine, read_engine = get_engine(), get_read_engine()
+    async with engine.begin() as conn:
+        app.state.schema_migrated = await conn.run_sync(migrate_schema)
+    if app.state.schema_migrated:
+        logger.info("Database schema migrated")
     yield
-    # Optional: Cleanup on shutdown
\ No newline at end of file
+    # Release pooled connections bound to this event loop
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await tenant_engines.dispose()
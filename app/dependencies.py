@@ -1,15 +1,147 @@
-from fastapi import HTTPException, status
-from app.db import SessionDep
-from app.models import Client
+import asyncio
+from collections import defaultdict
+from typing import Annotated, Iterable, TypeVar
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.exceptions import RequestValidationError
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import ReadSessionDep, SessionDep
+from app.models import Client, Transaction, not_deleted
 
-async def get_client_or_404(client_id: int, session: SessionDep) -> Client:
+MAX_BATCH_IDS = 5000
+# Ids per IN (...) query, well below SQLite's bound parameter limit
+IN_CHUNK_SIZE = 900
+
+M = TypeVar("M", bound=SQLModel)
+
+
+class Loader:
+    """
+    Request-scoped, DataLoader-style lookups by primary key over one
+    session. `load` calls for a model issued in the same event-loop tick
+    are answered by one IN query per chunk, and each id is fetched at
+    most once per request, missing ones included.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._results: dict[tuple[type, int], asyncio.Future] = {}
+        self._queued: dict[type, list[int]] = defaultdict(list)
+        self._tasks: set[asyncio.Task] = set()
+        # An AsyncSession runs one statement at a time
+        self._lock = asyncio.Lock()
+
+    def load(self, model: type[M], entity_id: int) -> asyncio.Future:
+        """Future of the row with this id, or None"""
+        key = (model, entity_id)
+        if key not in self._results:
+            loop = asyncio.get_running_loop()
+            self._results[key] = loop.create_future()
+            if not self._queued[model]:
+                # Dispatch once the caller and its siblings have queued their ids
+                loop.call_soon(self._schedule, model)
+            self._queued[model].append(entity_id)
+        return self._results[key]
+
+    async def load_many(self, model: type[M], ids: list[int]) -> dict[int, M | None]:
+        rows = await asyncio.gather(*(self.load(model, entity_id) for entity_id in ids))
+        return dict(zip(ids, rows))
+
+    def _schedule(self, model: type[SQLModel]) -> None:
+        task = asyncio.ensure_future(self._dispatch(model))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, model: type[SQLModel]) -> None:
+        ids = self._queued.pop(model)
+        found = {}
+        try:
+            async with self._lock:
+                for chunk in chunked(ids):
+                    for row in (await self.session.exec(
+                            select(model).where(model.id.in_(chunk),
+                                                *not_deleted(model)))).all():
+                        found[row.id] = row
+        except Exception as exc:
+            for entity_id in ids:
+                self._results.pop((model, entity_id)).set_exception(exc)
+            return
+        for entity_id in ids:
+            self._results[(model, entity_id)].set_result(found.get(entity_id))
+
+
+# FastAPI caches dependencies per request, so handlers and the
+# dependencies they use share one loader
+async def get_loader(session: SessionDep) -> Loader:
+    return Loader(session)
+
+async def get_read_loader(session: ReadSessionDep) -> Loader:
+    return Loader(session)
+
+LoaderDep = Annotated[Loader, Depends(get_loader)]
+ReadLoaderDep = Annotated[Loader, Depends(get_read_loader)]
+
+async def get_client_or_404(client_id: int, loader: LoaderDep) -> Client:
     """
     Common dependency to get a client by ID or raise a 404 error
     """
-    client = session.get(Client, client_id)
+    client = await loader.load(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Client not found"
         )
-    return client
\ No newline at end of file
+    return client
+
+ClientDep = Annotated[Client, Depends(get_client_or_404)]
+
+async def get_ids(ids: Annotated[str, Query(description="Comma-separated ids")]) -> list[int]:
+    """
+    Parse `?ids=1,2,3` into distinct ids, keeping their order
+    """
+    try:
+        parsed = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="ids must be comma-separated integers")
+    parsed = list(dict.fromkeys(parsed))
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+IdsDep = Annotated[list[int], Depends(get_ids)]
+
+def chunked(items: list, size: int = IN_CHUNK_SIZE) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def sparse_fields(model: type[SQLModel]):
+    """
+    Dependency parsing `?fields=id,name` for a table model into the
+    requested columns, in table order and always with `id`. None means
+    every column.
+    """
+    columns = tuple(model.__table__.columns.keys())
+
+    async def get_fields(fields: Annotated[str | None, Query(
+            description=f"Comma-separated subset of: {', '.join(columns)}")] = None
+                         ) -> tuple[str, ...] | None:
+        if fields is None:
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(requested.difference(columns))
+        if unknown:
+            raise RequestValidationError([{
+                "type": "value_error",
+                "loc": ("query", "fields"),
+                "msg": f"Value error, Unknown fields: {', '.join(unknown)}",
+                "input": fields,
+            }])
+        return tuple(name for name in columns if name == "id" or name in requested)
+
+    return get_fields
+
+ClientFieldsDep = Annotated[tuple[str, ...] | None, Depends(sparse_fields(Client))]
+TransactionFieldsDep = Annotated[tuple[str, ...] | None,
+                                 Depends(sparse_fields(Transaction))]
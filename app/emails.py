@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from fastapi import HTTPException, status
+from fastapi.exceptions import RequestValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.db import current_tenant, new_session
+from app.models import Client
+
+logger = logging.getLogger(__name__)
+
+class EmailRegistry:
+    """
+    In-process set of the client emails known to exist.
+
+    A miss means the email is almost certainly free, so the uniqueness
+    check skips the database; a hit is confirmed with an indexed query.
+    Other workers may insert emails this process has not seen, which is
+    why the unique index on client.email stays the source of truth.
+    Only the default database is tracked; tenant shards always query.
+
+    The set is loaded by a background task after startup, so booting a
+    worker does not read the whole table; every check queries until then.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.loaded = False
+        self._emails: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.enabled:
+            self.loaded, self._emails = False, set()
+            self._task = asyncio.create_task(self._load())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def wait_loaded(self) -> None:
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def reload(self) -> None:
+        """Load the set again and wait for it, e.g. after seeding the table"""
+        await self.stop()
+        self.start()
+        await self.wait_loaded()
+
+    async def _load(self) -> None:
+        try:
+            async with new_session(read_only=True) as session:
+                result = await session.stream_scalars(
+                    select(Client.email).execution_options(yield_per=10_000))
+                emails = {email async for email in result}
+        except Exception:
+            logger.exception("Loading the email registry failed")
+            return
+        # Emails written while loading are in the set already
+        self._emails |= emails
+        self.loaded = True
+
+    def might_exist(self, email: str) -> bool:
+        return (not self.loaded or current_tenant.get() is not None
+                or email in self._emails)
+
+    def add(self, email: str | None) -> None:
+        if self.enabled and email and current_tenant.get() is None:
+            self._emails.add(email)
+
+    def discard(self, email: str | None) -> None:
+        # A discard racing the load may be undone by it, which only costs
+        # an extra query for that email
+        if self.enabled and email and current_tenant.get() is None:
+            self._emails.discard(email)
+
+
+email_registry = EmailRegistry(enabled=get_settings().email_lookup_cache)
+
+
+def email_exists_error(email: str) -> RequestValidationError:
+    """Same error the email validator used to raise"""
+    return RequestValidationError([{
+        "type": "value_error",
+        "loc": ("body", "email"),
+        "msg": "Value error, Email already exists",
+        "input": email,
+    }])
+
+
+async def ensure_email_available(email: str, session: AsyncSession,
+                                 client_id: int | None = None) -> None:
+    """
+    Raise a 422 when another client already owns the email
+    """
+    if not email_registry.might_exist(email):
+        return
+    query = select(Client.id).where(Client.email == email)
+    if client_id is not None:
+        query = query.where(Client.id != client_id)
+    if (await session.exec(query)).first() is not None:
+        raise email_exists_error(email)
+
+
+async def flush_client(session: AsyncSession, client: Client) -> None:
+    """
+    Flush a new client inside a write operation (see app.writer), turning
+    a violation of the unique email index into the same 422
+    """
+    try:
+        await session.flush()
+    except IntegrityError as exc:
+        if "client.email" in str(exc.orig):
+            raise email_exists_error(client.email)
+        raise
+
+
+async def commit_client(session: AsyncSession, client: Client,
+                        previous_email: str | None = None) -> None:
+    """
+    Commit a created or updated client, turning a violation of the unique
+    email index (a race with another request) into the same 422
+    """
+    try:
+        await session.commit()
+    except IntegrityError as exc:
+        await session.rollback()
+        if "client.email" in str(exc.orig):
+            raise email_exists_error(client.email)
+        raise
+    except StaleDataError:
+        # Deleted by another request since it was loaded
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Client not found")
+    if previous_email != client.email:
+        email_registry.discard(previous_email)
+        email_registry.add(client.email)
@@ -0,0 +1,166 @@
+import csv
+import io
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Annotated, AsyncIterator, Literal
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from app.db import open_session
+from app.ledger import as_utc
+from app.models import Transaction
+from app.query_audit import query_auditor
+from app.serializers import row_encoder
+
+# Rows per server-side cursor fetch, CSV chunk and Parquet row group
+EXPORT_BATCH_SIZE = 10_000
+# The ledger file format; bookkeeping columns such as updated_at stay out
+EXPORT_FIELDS = ("amount", "description", "id", "client_id", "created_at")
+
+
+def load_pyarrow():
+    """(pyarrow, pyarrow.parquet), or Nones; imported on first use as it is slow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # pragma: no cover - parquet export is optional
+        return None, None
+    return pa, pq
+
+
+@dataclass
+class ExportParams:
+    """
+    Filters for a ledger export. Dates select [start, end) like invoices.
+    """
+    format: Annotated[Literal["csv", "parquet"], Query()] = "csv"
+    client_id: Annotated[int | None, Query()] = None
+    min_id: Annotated[int | None, Query(ge=1)] = None
+    max_id: Annotated[int | None, Query(ge=1)] = None
+    start: Annotated[datetime | None, Query()] = None
+    end: Annotated[datetime | None, Query()] = None
+
+ExportDep = Annotated[ExportParams, Depends()]
+
+
+def export_query(params: ExportParams):
+    encoder = row_encoder(Transaction, EXPORT_FIELDS)
+    query = encoder.query()
+    if params.min_id is not None:
+        query = query.where(Transaction.id >= params.min_id)
+    if params.max_id is not None:
+        query = query.where(Transaction.id <= params.max_id)
+    if params.client_id is not None:
+        query = query.where(Transaction.client_id == params.client_id)
+    if params.start is not None:
+        query = query.where(Transaction.created_at >= as_utc(params.start))
+    if params.end is not None:
+        query = query.where(Transaction.created_at < as_utc(params.end))
+    return query.order_by(Transaction.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def reads_whole_ledger(params: ExportParams) -> bool:
+    # Dates alone have no index: the ledger is walked in id order
+    return params.min_id is None and params.max_id is None and params.client_id is None
+
+
+async def row_batches(params: ExportParams) -> AsyncIterator[list]:
+    # The request session is closed before the body is sent
+    async with await open_session(read_only=True) as session:
+        if reads_whole_ledger(params):
+            # A full export scans the table on purpose
+            with query_auditor.suspended():
+                result = await session.stream(export_query(params))
+        else:
+            result = await session.stream(export_query(params))
+        async for rows in result.partitions():
+            yield rows
+
+
+async def csv_chunks(params: ExportParams) -> AsyncIterator[str]:
+    fields = row_encoder(Transaction, EXPORT_FIELDS).fields
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    # The header goes out before the query runs
+    yield buffer.getvalue()
+    created_at = fields.index("created_at")
+    async for rows in row_batches(params):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            row = list(row)
+            if row[created_at] is not None:
+                row[created_at] = row[created_at].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue()
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands out what was written since the last
+    `drain()`. `tell()` keeps counting from the start of the stream, as
+    the Parquet footer records absolute offsets.
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def parquet_schema(pa):
+    types = {"description": pa.string(), "created_at": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types.get(name, pa.int64()))
+                      for name in row_encoder(Transaction, EXPORT_FIELDS).fields])
+
+
+async def parquet_chunks(params: ExportParams) -> AsyncIterator[bytes]:
+    pa, pq = load_pyarrow()
+    schema = parquet_schema(pa)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    # Magic bytes, so the client sees the response start at once
+    yield sink.drain()
+    try:
+        async for rows in row_batches(params):
+            columns = list(zip(*rows))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type)
+                 for column, field in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(params: ExportParams) -> StreamingResponse:
+    """
+    Stream the matching transactions in id order, EXPORT_BATCH_SIZE rows
+    at a time, so memory stays flat whatever the size of the ledger
+    """
+    if params.format == "parquet":
+        if load_pyarrow()[0] is None:
+            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                                detail="Parquet export requires pyarrow")
+        return StreamingResponse(
+            parquet_chunks(params), media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": 'attachment; filename="transactions.parquet"'})
+    return StreamingResponse(
+        csv_chunks(params), media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="transactions.csv"'})
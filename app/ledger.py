@@ -0,0 +1,100 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.analytics import ledger_rows, record_revenue
+from app.models import ClientBalance, Transaction, utcnow
+
+# Stay far below SQLite's bound parameter limit in multi-row upserts
+UPSERT_CHUNK = 1000
+
+
+async def record_transactions(session: AsyncSession, rows: Iterable[dict]) -> None:
+    """
+    Fold new transactions into ClientBalance and DailyRevenue. Call it
+    before the commit that inserts the rows so balances and the ledger
+    never diverge.
+    """
+    rows = list(rows)
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        totals[row["client_id"]][0] += row["amount"] or 0
+        totals[row["client_id"]][1] += 1
+    now = utcnow()
+    values = [{"client_id": client_id, "balance": amount,
+               "transaction_count": count, "updated_at": now}
+              for client_id, (amount, count) in totals.items()]
+    for start in range(0, len(values), UPSERT_CHUNK):
+        statement = sqlite_insert(ClientBalance).values(values[start:start + UPSERT_CHUNK])
+        statement = statement.on_conflict_do_update(
+            index_elements=[ClientBalance.client_id],
+            set_={
+                "balance": ClientBalance.balance + statement.excluded.balance,
+                "transaction_count": (ClientBalance.transaction_count
+                                      + statement.excluded.transaction_count),
+                "updated_at": statement.excluded.updated_at,
+            })
+        await session.exec(statement)
+    await record_revenue(session, rows)
+
+
+async def get_balance(session: AsyncSession, client_id: int) -> ClientBalance:
+    return (await session.get(ClientBalance, client_id)
+            or ClientBalance(client_id=client_id))
+
+
+async def sum_transactions(session: AsyncSession, client_id: int,
+                           start: datetime | None = None,
+                           end: datetime | None = None) -> tuple[int, int]:
+    """
+    (total amount, count) of a client's transactions in [start, end).
+    Without a range this is a primary key lookup on ClientBalance.
+    """
+    if start is None and end is None:
+        balance = await get_balance(session, client_id)
+        return balance.balance, balance.transaction_count
+    query = (select(func.coalesce(func.sum(Transaction.amount), 0), func.count())
+             .where(Transaction.client_id == client_id)
+             .group_by(Transaction.client_id))
+    if start is not None:
+        query = query.where(Transaction.created_at >= as_utc(start))
+    if end is not None:
+        query = query.where(Transaction.created_at < as_utc(end))
+    row = (await session.exec(query)).first()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+async def ensure_balances(session: AsyncSession) -> None:
+    """
+    Backfill balances for a database whose transactions predate the
+    ClientBalance table
+    """
+    has_balances = (await session.exec(select(func.max(ClientBalance.client_id)))).one()[0]
+    has_transactions = (await session.exec(select(func.max(Transaction.id)))).one()[0]
+    if has_transactions is not None and has_balances is None:
+        await rebuild_balances(session)
+        await session.commit()
+
+
+async def rebuild_balances(session: AsyncSession) -> None:
+    """
+    Recompute every ClientBalance from the Transaction table and the
+    archive, so archiving leaves balances unchanged
+    """
+    ledger = ledger_rows("client_id", "amount", "created_at")
+    await session.exec(delete(ClientBalance))
+    await session.exec(insert(ClientBalance).from_select(
+        ["client_id", "balance", "transaction_count", "updated_at"],
+        select(ledger.c.client_id,
+               func.coalesce(func.sum(ledger.c.amount), 0),
+               func.count(),
+               func.max(ledger.c.created_at))
+        .group_by(ledger.c.client_id)))
+
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.series: dict[tuple, list[float]] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, label_names: tuple[str, ...]) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            base = format_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+def format_labels(names: tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"'
+                    for name, value in zip(names, values))
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_time: float = 0.0
+    statements: list[str] | None = None
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request",
+                                                              default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = Histogram("http_request_duration_seconds",
+                                  "Request latency by route", LATENCY_BUCKETS)
+        self.query_time = Histogram("http_request_db_seconds",
+                                    "Time spent in SQL per request by route",
+                                    LATENCY_BUCKETS)
+        self.query_count = Histogram("http_request_db_queries",
+                                     "SQL statements per request by route",
+                                     QUERY_COUNT_BUCKETS)
+        # Callables returning extra exposition lines, e.g. cache statistics
+        self.collectors: list[Callable[[], list[str]]] = []
+        self.lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, duration: float,
+               stats: RequestStats) -> None:
+        with self.lock:
+            self.requests.observe((method, route, status), duration)
+            self.query_time.observe((method, route), stats.query_time)
+            self.query_count.observe((method, route), stats.queries)
+
+    def render(self) -> str:
+        with self.lock:
+            lines = ["# HELP http_requests_in_flight Requests being served",
+                     "# TYPE http_requests_in_flight gauge",
+                     f"http_requests_in_flight {self.in_flight}"]
+            lines += self.requests.render(("method", "route", "status"))
+            lines += self.query_time.render(("method", "route"))
+            lines += self.query_count.render(("method", "route"))
+        for collect in self.collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, in-flight requests and the
+    SQL issued by each request. Requests slower than SLOW_REQUEST_MS are
+    logged together with their statements.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        slow_request_ms = get_settings().slow_request_ms
+        stats = RequestStats(statements=[] if slow_request_ms else None)
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.in_flight -= 1
+            current_request.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.record(scope["method"], route, status_code, duration, stats)
+            if slow_request_ms and duration * 1000 >= slow_request_ms:
+                logger.warning("Slow request %s %s: %.1fms, %d queries in %.1fms\n%s",
+                               scope["method"], scope["path"], duration * 1000,
+                               stats.queries, stats.query_time * 1000,
+                               "\n".join(stats.statements))
+
+
+# The start time lives on the execution context, which is dropped with the
+# statement: after_cursor_execute never runs for one that raises
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_time += elapsed
+        if stats.statements is not None:
+            stats.statements.append(f"[{elapsed * 1000:.1f}ms] {statement}")
+
+
+def instrument_engine(*engines: AsyncEngine) -> None:
+    for engine in engines:
+        target = engine.sync_engine
+        if not event.contains(target, "before_cursor_execute", before_cursor_execute):
+            event.listen(target, "before_cursor_execute", before_cursor_execute)
+            event.listen(target, "after_cursor_execute", after_cursor_execute)
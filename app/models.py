@@ -1,19 +1,54 @@
+from datetime import date, datetime, timezone
 from pydantic import BaseModel, EmailStr, field_validator
 from enum import Enum
-from sqlmodel import SQLModel, Field, Relationship, Session, select
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field, Relationship
 
-from app.db import engine
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def updated_at_field():
+    # Set on insert, bulk inserts included, and on every ORM update
+    return Field(default_factory=utcnow,
+                 sa_column_kwargs={"default": utcnow, "onupdate": utcnow})
+
+
+def not_deleted(model: type[SQLModel]) -> list:
+    # Filters hiding soft-deleted rows of models that have them (see app.archive)
+    return [model.deleted_at.is_(None)] if "deleted_at" in model.__table__.c else []
 
 
 class StatusEnum(str, Enum):
     active = "active"
     inactive = "inactive"
 
+class ChangeAction(str, Enum):
+    create = "create"
+    update = "update"
+    delete = "delete"
+
+class LinkEventKind(str, Enum):
+    started = "started"
+    churned = "churned"
+
 class ClientSuscription(SQLModel, table=True):
+    # Per-client lookups filter on client_id and usually status
+    __table_args__ = (
+        Index("ix_clientsuscription_client_id_status", "client_id", "status"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     client_id: int = Field(foreign_key="client.id")
-    status: StatusEnum = Field(default=StatusEnum.active)
-    suscription_id: int = Field(foreign_key="suscription.id")
+    status: StatusEnum = Field(default=StatusEnum.active, index=True)
+    suscription_id: int = Field(foreign_key="suscription.id", index=True)
+    # Latest activation and, while inactive, when it ended; the full
+    # history is in LinkEvent
+    started_at: datetime | None = Field(default=None)
+    ended_at: datetime | None = Field(default=None)
+    updated_at: datetime | None = updated_at_field()
+    suscription: "Suscription" = Relationship(
+                                        sa_relationship_kwargs={"viewonly": True})
 
 class Suscription(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
@@ -25,8 +60,8 @@ class Suscription(SQLModel, table=True):
 
 class ClientBase(SQLModel):
     name: str = Field(default=None, max_length=80)
-    age: int = Field(default=None)
-    email: EmailStr = Field(default=None, max_length=80)
+    age: int = Field(default=None, index=True)
+    email: EmailStr = Field(default=None, max_length=80, unique=True, index=True)
 
     # def validate(self):
     #     if self.age < 18:
@@ -38,10 +73,7 @@ class ClientBase(SQLModel):
 
     @field_validator("email")
     def validate_email(cls, value: str) -> str:
-        session = Session(engine)
-        existing_client = session.exec(select(Client).where(Client.email == value)).first()
-        if existing_client:
-            raise ValueError("Email already exists")
+        # Uniqueness is enforced by the unique index, see app.emails
         if not value:
             raise ValueError("Email is required")
     
@@ -57,33 +89,261 @@ class ClientUpdate(ClientBase):
 
 class Client(ClientBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
+    updated_at: datetime | None = updated_at_field()
+    # Set by a soft delete; the row is hidden from every read from then on
+    deleted_at: datetime | None = Field(default=None)
     transactions: list["Transaction"] = Relationship(back_populates="client")
     suscriptions: list["Suscription"] = Relationship(
                                         back_populates="clients",
                                         link_model=ClientSuscription)
+    # Link rows with their status, for loading plans together with it
+    suscription_links: list[ClientSuscription] = Relationship(
+                                        sa_relationship_kwargs={
+                                            "viewonly": True,
+                                            "order_by": "ClientSuscription.id"})
  
 
+class ClientSuscriptionDetail(SQLModel):
+    id: int
+    suscription_id: int
+    status: StatusEnum
+    name: str | None = None
+    price: int | None = None
+
+    @classmethod
+    def from_link(cls, link: ClientSuscription) -> "ClientSuscriptionDetail":
+        return cls(id=link.id, suscription_id=link.suscription_id,
+                   status=link.status, name=link.suscription.name,
+                   price=link.suscription.price)
+
+class ClientSuscriptions(SQLModel):
+    client_id: int
+    suscriptions: list[ClientSuscriptionDetail]
+
+class ClientSuscriptionsBatch(SQLModel):
+    clients: list[ClientSuscriptions]
+    missing: list[int]
+
+class ClientBatch(SQLModel):
+    clients: list[Client]
+    missing: list[int]
+
+class SuscriptionBatch(SQLModel):
+    suscriptions: list[Suscription]
+    missing: list[int]
+
+
 class TransactionBase(SQLModel):
     amount: int = Field(default=None)
     description: str = Field(default=None, max_length=80)
 
 
 class Transaction(TransactionBase, table=True):
+    # Serves per-client lookups as well as invoice date ranges
+    __table_args__ = (
+        Index("ix_transaction_client_id_created_at", "client_id", "created_at"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     client_id: int = Field(foreign_key="client.id")
+    # The column default also covers bulk inserts, which skip the model
+    created_at: datetime | None = Field(default_factory=utcnow,
+                                        sa_column_kwargs={"default": utcnow})
+    updated_at: datetime | None = updated_at_field()
     client: Client = Relationship(back_populates="transactions")
 
+class TransactionArchive(TransactionBase, table=True):
+    """
+    Transactions of soft-deleted clients, moved out of the ledger in
+    batches with their original ids (see app.archive)
+    """
+    id: int = Field(primary_key=True)
+    client_id: int = Field(index=True)
+    created_at: datetime | None = Field(default=None)
+    updated_at: datetime | None = Field(default=None)
+    archived_at: datetime | None = Field(default_factory=utcnow,
+                                         sa_column_kwargs={"default": utcnow})
+
+class ArchiveJob(SQLModel, table=True):
+    # Progress of archiving one soft-deleted client's transactions
+    client_id: int = Field(primary_key=True, foreign_key="client.id")
+    status: str = Field(default="running", max_length=20, index=True)
+    archived: int = Field(default=0)
+    started_at: datetime | None = Field(default_factory=utcnow)
+    finished_at: datetime | None = Field(default=None)
+
 class TransactionCreate(TransactionBase):
     client_id: int = Field(foreign_key="client.id")
 
-class Invoice(BaseModel):
+class ClientBalance(SQLModel, table=True):
+    """
+    Running totals per client, updated in the same database transaction
+    as every Transaction insert (see app.ledger)
+    """
+    client_id: int = Field(primary_key=True, foreign_key="client.id")
+    balance: int = Field(default=0)
+    transaction_count: int = Field(default=0)
+    updated_at: datetime | None = Field(default=None)
+
+class PlanStats(SQLModel, table=True):
+    """
+    Current subscriber counts per plan. This and the two daily rollups
+    below are updated in the same database transaction as the rows they
+    summarize (see app.analytics).
+    """
+    suscription_id: int = Field(primary_key=True, foreign_key="suscription.id")
+    active: int = Field(default=0)
+    inactive: int = Field(default=0)
+
+class LinkEvent(SQLModel, table=True):
+    """
+    Append-only history of subscription starts and churns, kept when the
+    link is deleted; PlanDailyStats counts it per day (see app.analytics)
+    """
+    id: int | None = Field(default=None, primary_key=True)
+    link_id: int = Field(index=True)
+    suscription_id: int = Field(foreign_key="suscription.id")
+    kind: LinkEventKind
+    at: datetime = Field(default_factory=utcnow)
+
+class PlanDailyStats(SQLModel, table=True):
+    # LinkEvents of each kind on `day`
+    day: date = Field(primary_key=True)
+    suscription_id: int = Field(primary_key=True, foreign_key="suscription.id")
+    started: int = Field(default=0)
+    churned: int = Field(default=0)
+
+class DailyRevenue(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    amount: int = Field(default=0)
+    transaction_count: int = Field(default=0)
+
+class PlanSummary(SQLModel):
+    suscription_id: int
+    name: str | None
+    price: int | None
+    active: int
+    inactive: int
+    mrr: int
+
+class SubscriberDay(SQLModel):
+    day: date
+    started: int
+    churned: int
+    active: int
+    churn_rate: float
+
+class RevenueDay(SQLModel):
+    day: date
+    amount: int
+    transaction_count: int
+
+class ChangeLog(SQLModel, table=True):
+    """
+    Append-only log of writes to clients, subscription links and
+    transactions. Its id is the cursor of GET /changes (see app.changes).
+    """
+    # Lets a reader follow one entity's changes, e.g. the client cache sync
+    __table_args__ = (
+        Index("ix_changelog_entity_id", "entity", "id"),
+    )
+    id: int | None = Field(default=None, primary_key=True)
+    entity: str = Field(max_length=40)
+    entity_id: int
+    action: ChangeAction
+    changed_at: datetime | None = Field(default_factory=utcnow,
+                                        sa_column_kwargs={"default": utcnow})
+
+class Change(SQLModel):
     id: int
+    entity: str
+    entity_id: int
+    action: ChangeAction
+    changed_at: datetime
+    # Current row, None once deleted
+    data: dict | None = None
+
+class ChangeFeed(SQLModel):
+    changes: list[Change]
+    # Pass back as `since`; returned even when nothing changed
+    next: str
+
+class SchemaFingerprint(SQLModel, table=True):
+    # Hash of the schema the database was last migrated to (see app.db)
+    fingerprint: str = Field(primary_key=True)
+
+class BillingRun(SQLModel, table=True):
+    """
+    One recurring-billing pass over the active subscriptions for a period.
+    Links with ids up to `max_link_id` are billed in fixed id-range chunks;
+    each finished chunk is recorded as a BillingChunk (see app.billing).
+    """
+    id: int | None = Field(default=None, primary_key=True)
+    period: str = Field(unique=True, index=True, max_length=20)
+    status: str = Field(default="running", max_length=20)
+    max_link_id: int = Field(default=0)
+    chunk_size: int = Field(default=1000)
+    charged: int = Field(default=0)
+    amount: int = Field(default=0)
+    started_at: datetime | None = Field(default_factory=utcnow)
+    finished_at: datetime | None = Field(default=None)
+
+class BillingChunk(SQLModel, table=True):
+    # Committed with the chunk's transactions, so a chunk is billed once
+    __table_args__ = (
+        Index("ix_billingchunk_run_id_chunk_start", "run_id", "chunk_start",
+              unique=True),
+    )
+    id: int | None = Field(default=None, primary_key=True)
+    run_id: int = Field(foreign_key="billingrun.id")
+    chunk_start: int
+    charged: int = Field(default=0)
+
+class BillingReport(SQLModel):
+    run_id: int
+    period: str
+    status: str
+    chunks: int
+    chunks_done: int
+    charged: int
+    amount: int
+    elapsed: float = 0
+    rows_per_second: float = 0
+
+class InvoiceCreate(SQLModel):
+    client_id: int
+    start: datetime | None = None
+    end: datetime | None = None
+    description: str | None = Field(default=None, max_length=80)
+
+class Invoice(BaseModel):
     client: ClientBase
-    transaction: list[Transaction]
-    ammount: int
-    description: str
-    date: str
-
-    @property
-    def total_amount(self) -> int:
-        return sum(transaction.amount for transaction in self.transaction)
\ No newline at end of file
+    total_amount: int
+    transaction_count: int
+    start: datetime | None = None
+    end: datetime | None = None
+    description: str | None = None
+    date: datetime
+
+class BulkError(SQLModel):
+    index: int
+    errors: list[dict]
+
+class BulkResult(SQLModel):
+    inserted: int = 0
+    errors: list[BulkError] = []
+
+class UserBase(SQLModel):
+    username: str = Field(unique=True, index=True, min_length=1)
+
+class UserCreate(UserBase):
+    password: str = Field(min_length=8)
+
+class UserUpdate(SQLModel):
+    password: str = Field(min_length=8)
+
+class User(UserBase, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    password_hash: str
+
+class UserPublic(UserBase):
+    id: int
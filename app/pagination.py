@@ -0,0 +1,108 @@
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import Annotated, Literal
+from fastapi import Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.db import new_session
+from app.models import not_deleted
+from app.serializers import row_encoder
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+STREAM_BATCH_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> int:
+    if not cursor:
+        return 0
+    try:
+        prefix, _, last_id = base64.urlsafe_b64decode(cursor).decode().partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(last_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Invalid cursor")
+
+
+@dataclass
+class PageParams:
+    """
+    Keyset pagination on `id`: pass the `X-Next-Cursor` header of the
+    previous page as `after`. `format=ndjson` streams every row after the
+    cursor instead of returning a single page.
+    """
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT
+    after: Annotated[str | None, Query()] = None
+    format: Annotated[Literal["json", "ndjson"], Query()] = "json"
+
+    @property
+    def after_id(self) -> int:
+        return decode_cursor(self.after)
+
+PageDep = Annotated[PageParams, Depends()]
+
+
+def keyset_query(model: type[SQLModel], page: PageParams, query=None):
+    query = query if query is not None else select(model)
+    return (query.where(model.id > page.after_id, *not_deleted(model))
+            .order_by(model.id))
+
+
+async def paginate(session: AsyncSession, model: type[SQLModel],
+                   page: PageParams, response: Response,
+                   fields: tuple[str, ...] | None = None):
+    """
+    Return one page of rows and set the next-cursor header when more may
+    follow. With FAST_JSON, or a sparse fieldset, the page is encoded
+    straight from row tuples of the selected columns.
+    """
+    if get_settings().fast_json or fields:
+        encoder = row_encoder(model, fields)
+        rows = (await session.exec(keyset_query(model, page, encoder.query())
+                                   .limit(page.limit))).all()
+        response = Response(encoder.encode(rows), media_type="application/json")
+        if len(rows) == page.limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+        return response
+
+    rows = (await session.exec(keyset_query(model, page)
+                               .limit(page.limit))).all()
+    if len(rows) == page.limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    return rows
+
+
+def stream_ndjson(model: type[SQLModel], page: PageParams,
+                  fields: tuple[str, ...] | None = None) -> StreamingResponse:
+    """
+    Stream every row after the cursor as NDJSON, fetching STREAM_BATCH_SIZE
+    rows at a time so memory stays flat regardless of the table size
+    """
+    fast = get_settings().fast_json or bool(fields)
+    encoder = row_encoder(model, fields)
+    query = keyset_query(model, page, encoder.query() if fast else None)
+    query = query.execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    async def lines():
+        # The request session is closed before the body is sent
+        async with new_session(read_only=True) as session:
+            if fast:
+                result = await session.stream(query)
+                async for rows in result.partitions():
+                    yield encoder.encode_lines(rows)
+            else:
+                result = await session.stream_scalars(query)
+                async for rows in result.partitions():
+                    yield "".join(row.model_dump_json() + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
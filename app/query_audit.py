@@ -0,0 +1,87 @@
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# "SCAN client" ("SCAN TABLE client" before SQLite 3.36) is a full table
+# scan; "SCAN client USING INDEX ...", "SEARCH ..." and virtual table
+# scans are not
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+# Subqueries SQLite builds itself, whose scans are bounded by the subquery
+SUBQUERY = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (\w+)$")
+
+
+class FullScanError(RuntimeError):
+    pass
+
+
+class QueryPlanAuditor:
+    """
+    Diagnostic mode: run EXPLAIN QUERY PLAN on every distinct SELECT the
+    first time it is issued and raise FullScanError if SQLite plans a full
+    table scan, so a missing or dropped index fails loudly.
+    Statements containing one of `allow`, or issued inside `suspended()`,
+    are skipped.
+    """
+
+    def __init__(self, allow: tuple[str, ...] = ()):
+        self.allow = allow
+        self.plans: dict[str, list[str]] = {}
+        self._suspended = ContextVar("query_audit_suspended", default=False)
+
+    @contextmanager
+    def suspended(self):
+        """For maintenance jobs that scan whole tables on purpose"""
+        token = self._suspended.set(True)
+        try:
+            yield
+        finally:
+            self._suspended.reset(token)
+
+    def install(self, *engines: AsyncEngine) -> None:
+        for engine in engines:
+            if not event.contains(engine.sync_engine, "before_cursor_execute", self.check):
+                event.listen(engine.sync_engine, "before_cursor_execute", self.check)
+
+    def uninstall(self, *engines: AsyncEngine) -> None:
+        for engine in engines:
+            if event.contains(engine.sync_engine, "before_cursor_execute", self.check):
+                event.remove(engine.sync_engine, "before_cursor_execute", self.check)
+
+    def check(self, conn, cursor, statement, parameters, context, executemany):
+        if (executemany or self._suspended.get() or statement in self.plans
+                or not statement.lstrip().upper().startswith("SELECT")
+                or any(allowed in statement for allowed in self.allow)):
+            return
+        plan = explain(conn, statement, parameters)
+        self.plans[statement] = plan
+        scans = full_scans(plan)
+        if scans:
+            logger.error("Full table scan on %s:\n%s", ", ".join(scans), statement)
+            raise FullScanError(
+                f"Full table scan on {', '.join(scans)}: {' '.join(statement.split())}")
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    """Tables an EXPLAIN QUERY PLAN reads in full, bar SQLite's own subqueries"""
+    subqueries = {SUBQUERY.match(step).group(1) for step in plan
+                  if SUBQUERY.match(step)}
+    return [FULL_SCAN.match(step).group(1) for step in plan
+            if FULL_SCAN.match(step)
+            and FULL_SCAN.match(step).group(1) not in subqueries]
+
+
+def explain(conn, statement: str, parameters) -> list[str]:
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+query_auditor = QueryPlanAuditor()
@@ -0,0 +1,43 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Query, Response
+from sqlmodel import SQLModel
+from app.auth import require_admin
+from app.models import Client, Transaction
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, NEXT_CURSOR_HEADER
+from app.serializers import dumps
+from app.tenants import decode_shard_cursor, fan_out_page
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+
+async def shard_list(model: type[SQLModel], limit: int, after: str | None) -> Response:
+    rows, cursor = await fan_out_page(model, decode_shard_cursor(after), limit)
+    response = Response(dumps(rows), media_type="application/json")
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return response
+
+
+@router.get("/clients")
+async def list_all_clients(
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+    after: Annotated[str | None, Query()] = None,
+):
+    """
+    Clients of every tenant shard, ordered by id and then tenant, each
+    with its `tenant`. Page with the X-Next-Cursor header as `after`.
+    """
+    return await shard_list(Client, limit, after)
+
+
+@router.get("/transactions")
+async def list_all_transactions(
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+    after: Annotated[str | None, Query()] = None,
+):
+    """Transactions of every tenant shard, paged like /admin/clients"""
+    return await shard_list(Transaction, limit, after)
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.analytics import plan_summaries, revenue_days, subscriber_days
+from app.auth import require_user
+from app.db import ReadSessionDep
+from app.models import PlanSummary, RevenueDay, SubscriberDay, utcnow
+
+MAX_DAYS = 366
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(require_user)]
+)
+
+
+def day_range(start: date | None = Query(None), end: date | None = Query(None)
+              ) -> tuple[date, date]:
+    """[start, end] in UTC days, the last 30 days by default"""
+    end = end or utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end or (end - start).days >= MAX_DAYS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"start must be before end, at most {MAX_DAYS} days apart")
+    return start, end
+
+DayRangeDep = Annotated[tuple[date, date], Depends(day_range)]
+
+
+@router.get('/plans', response_model=list[PlanSummary])
+async def get_plan_analytics(session: ReadSessionDep):
+    """Active and inactive subscribers and monthly revenue of every plan"""
+    return await plan_summaries(session)
+
+@router.get('/subscribers', response_model=list[SubscriberDay])
+async def get_subscriber_analytics(session: ReadSessionDep, days: DayRangeDep,
+                                   suscription_id: int | None = Query(None)):
+    """New and churned subscribers, active count and churn rate per day"""
+    return await subscriber_days(session, *days, suscription_id)
+
+@router.get('/revenue', response_model=list[RevenueDay])
+async def get_revenue_analytics(session: ReadSessionDep, days: DayRangeDep):
+    """Transaction totals per day"""
+    return await revenue_days(session, *days)
@@ -0,0 +1,41 @@
+from typing import Annotated
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Path, Query, status
+from app.auth import require_user
+from app.billing import (DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS, PERIOD, billing_report,
+                         current_period, get_run, run_billing, start_run)
+from app.db import SessionDep, ReadSessionDep
+from app.models import BillingReport
+
+router = APIRouter(
+    prefix="/billing",
+    tags=["billing"],
+    dependencies=[Depends(require_user)]
+)
+
+
+@router.post('/runs', response_model=BillingReport,
+             status_code=status.HTTP_202_ACCEPTED)
+async def start_billing_run(
+    session: SessionDep,
+    background_tasks: BackgroundTasks,
+    period: Annotated[str | None, Query(pattern=PERIOD.pattern)] = None,
+    workers: Annotated[int, Query(ge=1, le=32)] = DEFAULT_WORKERS,
+    chunk_size: Annotated[int, Query(ge=1, le=10_000)] = DEFAULT_CHUNK_SIZE,
+):
+    """
+    Start, or resume, the billing run for a period (default: this month)
+    in the background. Poll GET /billing/runs/{period} for progress.
+    """
+    run = await start_run(session, period or current_period(), chunk_size)
+    if run.status != "completed":
+        background_tasks.add_task(run_billing, run.period, workers, run.chunk_size)
+    return await billing_report(session, run)
+
+@router.get('/runs/{period}', response_model=BillingReport)
+async def get_billing_run(period: Annotated[str, Path(pattern=PERIOD.pattern)],
+                          session: ReadSessionDep):
+    run = await get_run(session, period)
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Billing run not found")
+    return await billing_report(session, run)
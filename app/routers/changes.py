@@ -0,0 +1,27 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Query
+from app.auth import require_user
+from app.changes import read_changes
+from app.db import ReadSessionDep
+from app.models import ChangeFeed
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_cursor
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["changes"],
+    dependencies=[Depends(require_user)]
+)
+
+
+@router.get('', response_model=ChangeFeed)
+async def get_changes(
+    session: ReadSessionDep,
+    since: Annotated[str | None, Query(description="`next` of the previous call")] = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+):
+    """
+    Creates, updates and deletes of clients, subscription links and
+    transactions since the cursor, oldest first. Without `since` the feed
+    starts at the beginning of the log. `data` is the row as it is now.
+    """
+    return await read_changes(session, decode_cursor(since), limit)
@@ -1,94 +1,291 @@
-from fastapi import APIRouter, HTTPException, status, Query
+import asyncio
+from contextlib import nullcontext
+from fastapi import (APIRouter, Depends, HTTPException, Request,
+                     Response, status, Query)
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import select
-from app.models import (Client, ClientCreate, ClientUpdate, 
-                        Suscription, ClientSuscription, StatusEnum)
-from app.db import SessionDep
-from app.dependencies import get_client_or_404
+from app.models import (Client, ClientCreate, ClientUpdate, BulkResult, ClientBalance,
+                        Suscription, ClientSuscription, StatusEnum,
+                        ClientSuscriptionDetail, ClientSuscriptions,
+                        ClientSuscriptionsBatch, ClientBatch, ChangeAction,
+                        ArchiveJob, not_deleted, utcnow)
+from app.db import SessionDep, ReadSessionDep
+from app.auth import require_user
+from app.dependencies import (ClientDep, ClientFieldsDep, IdsDep, LoaderDep,
+                              ReadLoaderDep, chunked)
+from app.emails import (ensure_email_available, commit_client, flush_client,
+                        email_registry)
+from app.pagination import PageDep, paginate, stream_ndjson
+from app.serializers import row_encoder
+from app.bulk import validated_chunks, insert_chunk, row_error
+from app.ledger import get_balance
+from app.analytics import link_state, record_link_changes
+from app.archive import archiver, purge_client, soft_delete_client
+from app.changes import record_changes
+from app.query_audit import query_auditor
+from app.search import SearchDep, search_query
+from app.writer import run_write
+from app.client_cache import client_cache
 
 router = APIRouter(
     prefix="/clients",
-    tags=["clients"]
+    tags=["clients"],
+    dependencies=[Depends(require_user)]
 )
 
 
 @router.post('/', response_model=Client)
 async def create_client(client_data: ClientCreate, session: SessionDep):
-    client = Client.model_validate(client_data.model_dump())
-    session.add(client)
-    session.commit()
-    session.refresh(client)
+    await ensure_email_available(client_data.email, session)
+
+    async def insert_client(write_session):
+        client = Client.model_validate(client_data.model_dump())
+        write_session.add(client)
+        await flush_client(write_session, client)
+        await record_changes(write_session, Client, ChangeAction.create, [client.id])
+        return client
+
+    client = await run_write(session, insert_client)
+    email_registry.add(client.email)
+    # Drops a cached "does not exist" for the new id
+    client_cache.invalidate(client.id)
     return client
 
+@router.post('/bulk', response_model=BulkResult,
+             status_code=status.HTTP_201_CREATED)
+async def create_clients_bulk(request: Request, session: SessionDep):
+    """
+    Create clients from a JSON array or an NDJSON body
+    (Content-Type: application/x-ndjson), one transaction per chunk.
+    Rejected rows are reported by their position in the body.
+    """
+    result = BulkResult()
+    seen = set()
+    async for chunk in validated_chunks(request, ClientCreate, result):
+        emails = [client_data.email for _, client_data in chunk]
+        existing = set((await session.exec(select(Client.email)
+                                           .where(Client.email.in_(emails)))).all())
+        rows = []
+        for index, client_data in chunk:
+            if client_data.email in existing or client_data.email in seen:
+                result.errors.append(row_error(index, "Email already exists", ("email",)))
+                continue
+            seen.add(client_data.email)
+            rows.append((index, client_data.model_dump()))
+        inserted = await insert_chunk(
+            session, Client, rows, result, conflict="Email already exists",
+            conflict_loc=("email",), before_commit=lambda inserted: record_changes(
+                session, Client, ChangeAction.create, [row["id"] for row in inserted]))
+        for row in inserted:
+            email_registry.add(row["email"])
+            client_cache.invalidate(row["id"])
+    return result
+
 @router.get('/', response_model=list[Client])
-async def get_clients(session: SessionDep):
-    return session.exec(select(Client)).all()
+async def get_clients(session: ReadSessionDep, page: PageDep, response: Response,
+                      fields: ClientFieldsDep):
+    if page.format == "ndjson":
+        return stream_ndjson(Client, page, fields)
+    return await paginate(session, Client, page, response, fields)
+
+@router.get('/search', response_model=list[Client])
+async def search_clients(params: SearchDep, session: ReadSessionDep,
+                         fields: ClientFieldsDep):
+    """
+    Find clients by name or email words (prefix matching, ranked), email
+    prefix, age range and subscription status. Page with limit/offset.
+    """
+    # Unfiltered, the page is read off the table in id order on purpose
+    with query_auditor.suspended() if params.unfiltered else nullcontext():
+        if fields:
+            encoder = row_encoder(Client, fields)
+            rows = (await session.exec(search_query(params, encoder))).all()
+            return Response(encoder.encode(rows), media_type="application/json")
+        return (await session.exec(search_query(params))).all()
+
+@router.get('/batch', response_model=ClientBatch)
+async def get_clients_batch(ids: IdsDep, loader: ReadLoaderDep):
+    """
+    Many clients by id, one query per chunk of ids
+    """
+    found = await loader.load_many(Client, ids)
+    return ClientBatch(
+        clients=[client for client in found.values() if client is not None],
+        missing=[client_id for client_id, client in found.items() if client is None])
+
+def suscription_links(suscription_status: StatusEnum | None):
+    links = Client.suscription_links
+    if suscription_status is not None:
+        links = links.and_(ClientSuscription.status == suscription_status)
+    return links
+
+@router.get('/suscriptions', response_model=ClientSuscriptionsBatch)
+async def get_clients_suscriptions(ids: IdsDep, session: ReadSessionDep,
+                                   suscription_status: StatusEnum | None = Query(None)):
+    """
+    Subscriptions of many clients, two queries per chunk of ids
+    """
+    found = {}
+    for chunk in chunked(ids):
+        clients = (await session.exec(
+            select(Client).where(Client.id.in_(chunk), *not_deleted(Client))
+            .options(selectinload(suscription_links(suscription_status))
+                     .joinedload(ClientSuscription.suscription)))).all()
+        for client in clients:
+            found[client.id] = ClientSuscriptions(
+                client_id=client.id,
+                suscriptions=[ClientSuscriptionDetail.from_link(link)
+                              for link in client.suscription_links])
+    return ClientSuscriptionsBatch(
+        clients=[found[client_id] for client_id in ids if client_id in found],
+        missing=[client_id for client_id in ids if client_id not in found])
 
 @router.get('/{client_id}', response_model=Client)
-async def get_client(client_id: int, session: SessionDep):
-    client = session.get(Client, client_id)
-    if not client:
+async def get_client(client_id: int, session: ReadSessionDep, fields: ClientFieldsDep):
+    if fields:
+        encoder = row_encoder(Client, fields)
+        row = (await session.exec(encoder.query().where(Client.id == client_id,
+                                                        *not_deleted(Client)))).first()
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                                detail="Client not found")
+        return Response(encoder.encode_one(row), media_type="application/json")
+    body = await client_cache.get(session, client_id)
+    if body is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="Client not found")
-    return client
+    return Response(body, media_type="application/json")
+
+@router.get('/{client_id}/balance', response_model=ClientBalance)
+async def get_client_balance(client_id: int, session: ReadSessionDep):
+    if not await client_cache.exists(session, client_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                            detail="Client not found")
+    return await get_balance(session, client_id)
 
 @router.delete('/{client_id}')
-async def delete_client(client_id: int, session: SessionDep):
-    client = session.get(Client, client_id)
-    if not client:
+async def delete_client(client_id: int, session: SessionDep,
+                        soft: bool = Query(False)):
+    """
+    Delete a client with its subscriptions, transactions and balance in
+    one database transaction. With `soft=true` the client is flagged as
+    deleted instead and its transactions move to the archive in the
+    background; poll GET /clients/{client_id}/archive. A soft-deleted
+    client keeps its email until it is deleted for good.
+    """
+    client = await session.get(Client, client_id)
+    if not client or (soft and client.deleted_at is not None):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="Client not found")
-    session.delete(client)
-    session.commit()
+    if soft:
+        await soft_delete_client(session, client)
+    else:
+        await purge_client(session, client)
+    await session.commit()
+    client_cache.invalidate(client_id)
+    if soft:
+        archiver.submit(client_id)
+        return {"message": "Client deleted, archiving its transactions"}
+    email_registry.discard(client.email)
     return {"message": "Client deleted successfully"}
 
+@router.get('/{client_id}/archive', response_model=ArchiveJob)
+async def get_client_archive(client_id: int, session: ReadSessionDep):
+    """Progress of archiving a soft-deleted client's transactions"""
+    job = await session.get(ArchiveJob, client_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                            detail="Archive not found")
+    return job
+
 @router.patch('/{client_id}', 
            response_model=Client, 
            status_code=status.HTTP_201_CREATED)
-async def update_client(client_id: int, client_data: ClientUpdate, session: SessionDep):
-    client = session.get(Client, client_id)
-    if not client:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
-                            detail="Client not found")
+async def update_client(client: ClientDep, client_data: ClientUpdate, session: SessionDep):
     client_data_dict = client_data.model_dump(exclude_unset=True)
+    if "email" in client_data_dict:
+        await ensure_email_available(client_data_dict["email"], session, client.id)
+    previous_email = client.email
+    # Logged before the change is applied, so its autoflush cannot run
+    # the UPDATE outside the error handling of commit_client
+    await record_changes(session, Client, ChangeAction.update, [client.id])
     client.sqlmodel_update(client_data_dict)
     session.add(client)
-    session.commit()
-    session.refresh(client)
+    await commit_client(session, client, previous_email)
+    client_cache.invalidate(client.id)
+    await session.refresh(client)
     return client
 
 
-@router.post('/{client_id}/suscribe/{susceiption_id}')
+@router.post('/{client_id}/suscribe/{suscription_id}')
 async def suscribe_client(client_id: int, suscription_id: int , 
-                          session: SessionDep,
+                          session: SessionDep, loader: LoaderDep,
                           suscription_status: StatusEnum =Query()):
-    client_db = session.get(Client, client_id)
+    client_db, suscription_db = await asyncio.gather(
+        loader.load(Client, client_id), loader.load(Suscription, suscription_id))
     if not client_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="Client not found")
     
-    suscription_db = session.get(Suscription, suscription_id)
     if not suscription_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="Suscription not found")
 
-    client_suscription = ClientSuscription(client_id=client_db.id, 
-                                           suscription_id=suscription_db.id,
-                                           status=suscription_status)
-    session.add(client_suscription)
-    session.commit()
-    session.refresh(client_suscription)
-    return client_suscription
-    
+    async def insert_link(write_session):
+        client_suscription = ClientSuscription(client_id=client_db.id, 
+                                               suscription_id=suscription_db.id,
+                                               status=suscription_status)
+        if suscription_status == StatusEnum.active:
+            client_suscription.started_at = utcnow()
+        write_session.add(client_suscription)
+        await write_session.flush()
+        await record_link_changes(write_session, [(client_suscription.id, None,
+                                                   link_state(client_suscription))])
+        await record_changes(write_session, ClientSuscription, ChangeAction.create,
+                             [client_suscription.id])
+        return client_suscription
+
+    return await run_write(session, insert_link)
+
+@router.patch('/{client_id}/suscriptions/{link_id}', response_model=ClientSuscription)
+async def update_client_suscription(client_id: int, link_id: int, session: SessionDep,
+                                    suscription_status: StatusEnum = Query()):
+    """
+    Activate or deactivate one of a client's subscriptions. Activating
+    restarts it; deactivating records when it ended.
+    """
+    async def change_status(write_session):
+        link = await write_session.get(ClientSuscription, link_id)
+        if not link or link.client_id != client_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                                detail="Suscription not found")
+        if link.status == suscription_status:
+            return link
+        before = link_state(link)
+        link.status = suscription_status
+        if suscription_status == StatusEnum.active:
+            link.started_at, link.ended_at = utcnow(), None
+        else:
+            link.ended_at = utcnow()
+        write_session.add(link)
+        await record_link_changes(write_session, [(link.id, before, link_state(link))])
+        await record_changes(write_session, ClientSuscription, ChangeAction.update,
+                             [link.id])
+        return link
+
+    return await run_write(session, change_status)
+
 
-@router.get('/{client_id}/suscriptions')
-async def get_client_suscriptions(client_id: int, session: SessionDep,
-                                  suscription_status: StatusEnum =Query()):
-    client = session.get(Client, client_id)
+@router.get('/{client_id}/suscriptions', response_model=list[ClientSuscriptionDetail])
+async def get_client_suscriptions(client_id: int, session: ReadSessionDep,
+                                  suscription_status: StatusEnum | None = Query(None)):
+    # One query: the client joined to its links and their plans
+    client = (await session.exec(
+        select(Client).where(Client.id == client_id, *not_deleted(Client))
+        .options(joinedload(suscription_links(suscription_status))
+                 .joinedload(ClientSuscription.suscription)))).unique().first()
     if not client:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="Client not found")
-    # suscriptions = session.exec(select(Suscription).join(ClientSuscription)).all()
-    suscriptions = session.exec(select(ClientSuscription)
-                 .where(ClientSuscription.client_id == client_id)
-                 .where(ClientSuscription == suscription_status)).all()
-    return suscriptions
\ No newline at end of file
+    return [ClientSuscriptionDetail.from_link(link)
+            for link in client.suscription_links]
\ No newline at end of file
@@ -1,22 +1,46 @@
-from fastapi import APIRouter, HTTPException, status
-from sqlmodel import select
-from app.models import Suscription #, SuscriptionCreate, SuscriptionUpdate
-from app.db import SessionDep
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from app.models import Suscription, SuscriptionBatch #, SuscriptionCreate, SuscriptionUpdate
+from app.cache import ResponseCache
+from app.config import get_settings
+from app.db import SessionDep, ReadSessionDep
+from app.auth import require_user
+from app.dependencies import IdsDep, ReadLoaderDep
+from app.pagination import PageDep, paginate, stream_ndjson
 
 router = APIRouter(
     prefix="/suscriptions",
-    tags=["suscriptions"]
+    tags=["suscriptions"],
+    dependencies=[Depends(require_user)]
 )
 
+# Plans change rarely; every mutation must call catalog_cache.invalidate()
+catalog_cache = ResponseCache(maxsize=get_settings().catalog_cache_size,
+                              ttl=get_settings().catalog_cache_ttl)
+
 
 @router.post('/', response_model=Suscription)
 async def create_suscription(suscription_data: Suscription, session: SessionDep):
     suscription_db = Suscription.model_validate(suscription_data.model_dump())
     session.add(suscription_db)
-    session.commit()
-    session.refresh(suscription_db)
+    await session.commit()
+    catalog_cache.invalidate()
+    await session.refresh(suscription_db)
     return suscription_db
 
 @router.get('/', response_model=list[Suscription])
-async def get_suscriptions(session: SessionDep):
-    return session.exec(select(Suscription)).all()
\ No newline at end of file
+@catalog_cache
+async def get_suscriptions(request: Request, session: ReadSessionDep,
+                           page: PageDep, response: Response):
+    if page.format == "ndjson":
+        return stream_ndjson(Suscription, page)
+    return await paginate(session, Suscription, page, response)
+
+@router.get('/batch', response_model=SuscriptionBatch)
+async def get_suscriptions_batch(ids: IdsDep, loader: ReadLoaderDep):
+    """
+    Many plans by id, one query per chunk of ids
+    """
+    found = await loader.load_many(Suscription, ids)
+    return SuscriptionBatch(
+        suscriptions=[plan for plan in found.values() if plan is not None],
+        missing=[plan_id for plan_id, plan in found.items() if plan is None])
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, HTTPException, status
-from sqlmodel import Session, select
-from app.models import Transaction, Invoice, TransactionCreate, Client
-from app.db import SessionDep
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlmodel import select
+from app.models import (Transaction, Invoice, InvoiceCreate, TransactionCreate,
+                        Client, BulkResult, ChangeAction, not_deleted, utcnow)
+from app.db import SessionDep, ReadSessionDep
+from app.auth import require_user
+from app.dependencies import ReadLoaderDep, TransactionFieldsDep
+from app.client_cache import client_cache
+from app.pagination import PageDep, paginate, stream_ndjson
+from app.bulk import validated_chunks, insert_chunk, row_error
+from app.ledger import record_transactions, sum_transactions
+from app.changes import record_changes
+from app.export import ExportDep, stream_export
+from app.writer import run_write
 
 router = APIRouter(
     prefix="/transactions",
-    tags=["transactions"]
+    tags=["transactions"],
+    dependencies=[Depends(require_user)]
 )
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -14,26 +25,96 @@ async def create_transaction(
     session: SessionDep,
     ):
     transaction_data_dict =  transaction_data.model_dump()
-    client = session.get(Client, transaction_data_dict["client_id"])
-    if not client:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
-                            detail="Client not found")
-    transaction = Transaction.model_validate(transaction_data_dict)
-    session.add(transaction)
-    session.commit()
-    session.refresh(transaction)
-    return transaction
-
-@router.get("/")
-def get_list_transactions(
-    session: SessionDep
+    client_id = transaction_data_dict["client_id"]
+    async def insert_transaction(write_session):
+        # Checked in the write transaction, as a cached client may have
+        # been deleted by another worker
+        if (await write_session.exec(select(Client.id).where(
+                Client.id == client_id, *not_deleted(Client)))).first() is None:
+            client_cache.invalidate(client_id)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail="Client not found")
+        transaction = Transaction.model_validate(transaction_data_dict)
+        write_session.add(transaction)
+        await record_transactions(write_session, [transaction.model_dump()])
+        await write_session.refresh(transaction)
+        await record_changes(write_session, Transaction, ChangeAction.create,
+                             [transaction.id])
+        return transaction
+
+    return await run_write(session, insert_transaction)
+
+@router.post("/bulk", response_model=BulkResult,
+             status_code=status.HTTP_201_CREATED)
+async def create_transactions_bulk(request: Request, session: SessionDep):
+    """
+    Create transactions from a JSON array or an NDJSON body
+    (Content-Type: application/x-ndjson), one transaction per chunk.
+    Rejected rows are reported by their position in the body.
+    """
+    result = BulkResult()
+
+    async def before_commit(inserted):
+        await record_transactions(session, inserted)
+        await record_changes(session, Transaction, ChangeAction.create,
+                             [row["id"] for row in inserted])
+
+    async for chunk in validated_chunks(request, TransactionCreate, result):
+        client_ids = {data.client_id for _, data in chunk}
+        existing = set((await session.exec(select(Client.id)
+                                           .where(Client.id.in_(client_ids),
+                                                  *not_deleted(Client)))).all())
+        rows = []
+        now = utcnow()
+        for index, data in chunk:
+            if data.client_id not in existing:
+                result.errors.append(row_error(index, "Client not found", ("client_id",)))
+                continue
+            rows.append((index, {**data.model_dump(), "created_at": now}))
+        await insert_chunk(session, Transaction, rows, result,
+                           conflict="Transaction rejected by the database",
+                           before_commit=before_commit)
+    return result
+
+@router.get("/", response_model=list[Transaction])
+async def get_list_transactions(
+    session: ReadSessionDep,
+    page: PageDep,
+    response: Response,
+    fields: TransactionFieldsDep,
 ):
-    transactions = session.exec(select(Transaction)).all()
-    return transactions
+    if page.format == "ndjson":
+        return stream_ndjson(Transaction, page, fields)
+    return await paginate(session, Transaction, page, response, fields)
+
+@router.get("/export")
+async def export_transactions(params: ExportDep):
+    """
+    Stream the ledger as CSV or Parquet, optionally filtered by client,
+    id range and [start, end) dates
+    """
+    return stream_export(params)
 
-@router.post("/invoice/")
+@router.post("/invoice/", response_model=Invoice)
 async def create_invoice(
-    invoice_data: Invoice,
-    # session: SessionDep
+    invoice_data: InvoiceCreate,
+    session: ReadSessionDep,
+    loader: ReadLoaderDep,
     ):
-    return invoice_data
\ No newline at end of file
+    """
+    Invoice a client's stored transactions, optionally limited to
+    [start, end). Without a range the total comes from the client balance.
+    """
+    client = await loader.load(Client, invoice_data.client_id)
+    if not client:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                            detail="Client not found")
+    total_amount, transaction_count = await sum_transactions(
+        session, client.id, invoice_data.start, invoice_data.end)
+    return Invoice(client=client.model_dump(),
+                   total_amount=total_amount,
+                   transaction_count=transaction_count,
+                   start=invoice_data.start,
+                   end=invoice_data.end,
+                   description=invoice_data.description,
+                   date=utcnow())
\ No newline at end of file
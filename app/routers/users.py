@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from app.auth import UserDep, credential_cache, hash_password, require_user
+from app.db import SessionDep
+from app.models import User, UserPublic, UserUpdate
+
+router = APIRouter(
+    prefix="/users",
+    tags=["users"],
+    dependencies=[Depends(require_user)]
+)
+
+
+# Users are created with `python -m app.auth create-user` only
+
+@router.patch('/{user_id}', response_model=UserPublic)
+async def change_password(user_id: int, user_data: UserUpdate,
+                          session: SessionDep, current_user: UserDep):
+    """
+    Change a password. With auth enabled users may only change their own,
+    and cached verifications of the old password are dropped.
+    """
+    if current_user is not None and current_user != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Cannot change another user's password")
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="User not found")
+    user.password_hash = await run_in_threadpool(hash_password, user_data.password)
+    await session.commit()
+    credential_cache.invalidate(user.username)
+    return user
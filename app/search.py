@@ -0,0 +1,155 @@
+import re
+from dataclasses import dataclass
+from typing import Annotated
+from fastapi import Depends, Query
+from sqlalchemy import column, event, inspect, literal_column, table, text
+from sqlmodel import SQLModel, select
+from app.models import Client, ClientSuscription, StatusEnum, not_deleted
+from app.pagination import MAX_LIMIT
+from app.serializers import RowEncoder
+
+MAX_OFFSET = 10_000
+
+# External-content FTS5 index over client.name and client.email, kept in
+# sync by triggers; prefix='2 3' makes short prefix queries index lookups
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS client_fts USING fts5(
+        name, email, content='client', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS client_fts_insert AFTER INSERT ON client BEGIN
+        INSERT INTO client_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+    # Soft-deleted clients leave the index when flagged, not when purged
+    "DROP TRIGGER IF EXISTS client_fts_delete",
+    """CREATE TRIGGER IF NOT EXISTS client_fts_purge AFTER DELETE ON client
+        WHEN old.deleted_at IS NULL BEGIN
+        INSERT INTO client_fts(client_fts, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS client_fts_soft_delete AFTER UPDATE OF deleted_at ON client
+        WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL BEGIN
+        INSERT INTO client_fts(client_fts, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS client_fts_update AFTER UPDATE OF name, email ON client BEGIN
+        INSERT INTO client_fts(client_fts, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO client_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+]
+# Part of the schema fingerprint, so changing the index re-runs startup DDL
+SQLModel.metadata.info.setdefault("ddl", []).extend(SEARCH_DDL)
+
+
+def create_search_index(conn) -> None:
+    """
+    Create the client search index and its triggers if missing, indexing
+    the clients that already exist
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    existed = inspect(conn).has_table("client_fts")
+    for statement in SEARCH_DDL:
+        conn.execute(text(statement))
+    if not existed:
+        conn.execute(text("INSERT INTO client_fts(client_fts) VALUES ('rebuild')"))
+        # Name matches rank above email matches
+        conn.execute(text("INSERT INTO client_fts(client_fts, rank) "
+                          "VALUES ('rank', 'bm25(2.0, 1.0)')"))
+
+
+# Runs after every create_all, so databases that predate the index get it
+@event.listens_for(SQLModel.metadata, "after_create")
+def _after_create(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(Client.__table__, "before_drop")
+def _before_drop(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS client_fts"))
+
+
+def match_expression(q: str) -> str | None:
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix,
+    in the name or the email. Words are quoted, so FTS5 syntax in the
+    input is searched for literally.
+    """
+    terms = [term for term in q.split() if re.search(r"\w", term)]
+    if not terms:
+        return None
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+
+@dataclass
+class SearchParams:
+    q: Annotated[str | None, Query(max_length=200,
+                                   description="Words matched as prefixes of name or email")] = None
+    email: Annotated[str | None, Query(max_length=80,
+                                       description="Email prefix")] = None
+    min_age: Annotated[int | None, Query(ge=0)] = None
+    max_age: Annotated[int | None, Query(ge=0)] = None
+    suscription_status: Annotated[StatusEnum | None, Query()] = None
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = 50
+    offset: Annotated[int, Query(ge=0, le=MAX_OFFSET)] = 0
+
+    @property
+    def unfiltered(self) -> bool:
+        return (match_expression(self.q or "") is None and not self.email
+                and self.min_age is None and self.max_age is None
+                and self.suscription_status is None)
+
+SearchDep = Annotated[SearchParams, Depends()]
+
+client_fts = table("client_fts", column("rowid"), column("rank"))
+
+
+def search_query(params: SearchParams, encoder: RowEncoder | None = None):
+    """
+    Clients matching every given filter, best text matches first. Each
+    filter is index backed: FTS5 for `q`, the unique email index for the
+    prefix, ix_client_age for the range and the link status index.
+    Without filters it is a page of every client in id order, which
+    scans the table up to offset + limit rows (see `unfiltered`). With
+    an `encoder` it selects only the encoder's columns.
+    """
+    query = encoder.query() if encoder is not None else select(Client)
+    filters = []
+    if params.email:
+        # A range instead of LIKE, which SQLite cannot serve from the index
+        filters += [Client.email >= params.email,
+                    Client.email < params.email + "\U0010ffff"]
+    if params.min_age is not None:
+        filters.append(Client.age >= params.min_age)
+    if params.max_age is not None:
+        filters.append(Client.age <= params.max_age)
+    if params.suscription_status is not None:
+        filters.append(Client.id.in_(
+            select(ClientSuscription.client_id)
+            .where(ClientSuscription.status == params.suscription_status)))
+
+    expression = match_expression(params.q or "")
+    if expression is None:
+        order = Client.id
+        if params.min_age is not None or params.max_age is not None:
+            # "+" keeps SQLite from walking the primary key for the order,
+            # which it prefers over the age index for an open-ended range
+            order = literal_column(f"+{Client.__tablename__}.id")
+        return (query.where(*filters, *not_deleted(Client))
+                .order_by(order)
+                .offset(params.offset).limit(params.limit))
+
+    matches = (select(client_fts.c.rowid, client_fts.c.rank)
+               .where(literal_column("client_fts").match(expression)))
+    if not filters:
+        # Rank and cut the page inside FTS5, then look up only those clients
+        matches = (matches.order_by(client_fts.c.rank, client_fts.c.rowid)
+                   .offset(params.offset).limit(params.limit))
+    matches = matches.subquery()
+    query = (query.join(matches, matches.c.rowid == Client.id)
+             .where(*filters, *not_deleted(Client))
+             .order_by(matches.c.rank, Client.id))
+    if filters:
+        query = query.offset(params.offset).limit(params.limit)
+    return query
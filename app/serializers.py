@@ -0,0 +1,63 @@
+import json
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Iterable, Sequence
+from sqlmodel import SQLModel, select
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(",", ":"),
+                      ensure_ascii=False).encode()
+
+
+class RowEncoder:
+    """
+    Encoder for one SQLModel table that skips ORM objects and Pydantic:
+    `query()` selects plain columns and `encode()` turns the row tuples
+    straight into JSON bytes with the same keys as the table model.
+    """
+
+    def __init__(self, model: type[SQLModel], fields: Sequence[str] | None = None):
+        table = model.__table__
+        self.model = model
+        self.fields = tuple(fields or table.columns.keys())
+        self.columns = [table.c[name] for name in self.fields]
+        # Built once per encoder; statements are immutable, so it is shared
+        self._query = select(*self.columns)
+
+    def query(self):
+        return self._query
+
+    def rows_to_dicts(self, rows: Iterable[Sequence]) -> list[dict]:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def encode(self, rows: Iterable[Sequence]) -> bytes:
+        return dumps(self.rows_to_dicts(rows))
+
+    def encode_one(self, row: Sequence) -> bytes:
+        return dumps(dict(zip(self.fields, row)))
+
+    def encode_lines(self, rows: Iterable[Sequence]) -> bytes:
+        return b"".join(dumps(row) + b"\n" for row in self.rows_to_dicts(rows))
+
+
+@lru_cache(maxsize=256)
+def row_encoder(model: type[SQLModel], fields: tuple[str, ...] | None = None) -> RowEncoder:
+    return RowEncoder(model, fields)
@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import glob
+import heapq
+import os
+import re
+from contextlib import nullcontext
+from itertools import islice
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.engine import make_url
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.db import (current_tenant, migrate_schema, tenant_engines, tenant_exists,
+                    tenant_url)
+from app.models import not_deleted
+from app.query_audit import query_auditor
+from app.serializers import row_encoder
+
+TENANT_HEADER = "X-Tenant-ID"
+# Also the shard's file name, so no dots or slashes
+TENANT_NAME = re.compile(r"[a-z0-9][a-z0-9_-]{0,62}")
+# Shards queried at once by a fan-out read
+FAN_OUT_CONCURRENCY = 8
+
+
+def sharding_enabled() -> bool:
+    return bool(get_settings().tenant_database_url)
+
+
+def tenant_path(tenant: str) -> str:
+    return make_url(tenant_url(tenant)).database or ""
+
+
+def list_tenants() -> list[str]:
+    """Tenants with a shard, from the SQLite files matching the URL template"""
+    if not sharding_enabled():
+        return []
+    prefix, _, suffix = tenant_path("*").partition("*")
+    names = (path[len(prefix):len(path) - len(suffix)]
+             for path in glob.glob(tenant_path("*")))
+    return sorted(name for name in names if TENANT_NAME.fullmatch(name))
+
+
+class TenantMiddleware:
+    """
+    ASGI middleware selecting the tenant shard from the X-Tenant-ID header
+    for everything the request does, background tasks included. Requests
+    without the header use the default database. Only the shard's file is
+    checked here; its engine is opened by the first session the request
+    needs (see app.db.open_session), after authentication.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not sharding_enabled():
+            return await self.app(scope, receive, send)
+        header = TENANT_HEADER.lower().encode()
+        tenant = next((value.decode("latin-1") for name, value in scope["headers"]
+                       if name == header), None)
+        if tenant is None:
+            return await self.app(scope, receive, send)
+        if not TENANT_NAME.fullmatch(tenant):
+            response = JSONResponse({"detail": "Invalid tenant"},
+                                    status_code=status.HTTP_400_BAD_REQUEST)
+            return await response(scope, receive, send)
+        if not tenant_exists(tenant):
+            response = JSONResponse({"detail": "Tenant not found"},
+                                    status_code=status.HTTP_404_NOT_FOUND)
+            return await response(scope, receive, send)
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+
+
+def encode_shard_cursor(last_id: int, tenant: str) -> str:
+    return base64.urlsafe_b64encode(f"{last_id}:{tenant}".encode()).decode()
+
+
+def decode_shard_cursor(cursor: str | None) -> tuple[int, str] | None:
+    if not cursor:
+        return None
+    try:
+        last_id, _, tenant = base64.urlsafe_b64decode(cursor).decode().partition(":")
+        if not TENANT_NAME.fullmatch(tenant):
+            raise ValueError(cursor)
+        return int(last_id), tenant
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Invalid cursor")
+
+
+async def fan_out_page(model: type[SQLModel], after: tuple[int, str] | None,
+                       limit: int) -> tuple[list[dict], str | None]:
+    """
+    One keyset page of `model` across every shard, ordered by (id, tenant)
+    and tagged with the tenant. Each shard returns at most `limit` rows
+    after the cursor and the sorted pages are merged, so a page costs one
+    indexed range query per shard. Returns the rows and the next cursor.
+    """
+    encoder = row_encoder(model)
+    semaphore = asyncio.Semaphore(FAN_OUT_CONCURRENCY)
+
+    async def shard_page(tenant: str) -> list[dict]:
+        query = encoder.query()
+        if after is not None:
+            last_id, last_tenant = after
+            # Ties on id continue with the tenants after the cursor's
+            query = query.where(model.id > last_id if tenant <= last_tenant
+                                else model.id >= last_id)
+        query = query.where(*not_deleted(model)).order_by(model.id).limit(limit)
+        async with semaphore:
+            engine = await tenant_engines.ensure(tenant)
+            async with AsyncSession(engine) as session:
+                # The first page reads each shard from its first row on purpose
+                with query_auditor.suspended() if after is None else nullcontext():
+                    rows = (await session.exec(query)).all()
+        return [{**row, "tenant": tenant} for row in encoder.rows_to_dicts(rows)]
+
+    pages = await asyncio.gather(*(shard_page(tenant) for tenant in list_tenants()))
+    rows = list(islice(heapq.merge(*pages, key=lambda row: (row["id"], row["tenant"])),
+                       limit))
+    cursor = encode_shard_cursor(rows[-1]["id"], rows[-1]["tenant"]) \
+        if len(rows) == limit else None
+    return rows, cursor
+
+
+async def create_tenant(tenant: str) -> None:
+    """Create the tenant's shard with the current schema"""
+    if not TENANT_NAME.fullmatch(tenant):
+        raise ValueError(f"Invalid tenant name {tenant!r}")
+    path = tenant_path(tenant)
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    async with tenant_engines.get(tenant).begin() as conn:
+        await conn.run_sync(migrate_schema)
+
+
+async def migrate_tenant(tenant: str) -> bool:
+    """
+    Bring a shard to the current schema and backfill its derived tables.
+    Returns whether the schema had to change.
+    """
+    from app.analytics import ensure_rollups
+    from app.ledger import ensure_balances
+    async with tenant_engines.get(tenant).begin() as conn:
+        migrated = await conn.run_sync(migrate_schema)
+    async with AsyncSession(tenant_engines.get(tenant)) as session:
+        await ensure_balances(session)
+        await ensure_rollups(session)
+    return migrated
+
+
+def main() -> None:
+    """
+    Manage tenant shards; TENANT_DATABASE_URL must be set:
+
+        python -m app.tenants create acme
+        python -m app.tenants migrate acme
+        python -m app.tenants migrate --all
+        python -m app.tenants list
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.tenants")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create")
+    create.add_argument("tenant")
+    migrate = commands.add_parser("migrate")
+    migrate.add_argument("tenant", nargs="?")
+    migrate.add_argument("--all", action="store_true")
+    commands.add_parser("list")
+    args = parser.parse_args()
+    if not sharding_enabled():
+        parser.error("TENANT_DATABASE_URL is not set")
+    if args.command == "migrate" and not (args.all or args.tenant):
+        parser.error("migrate needs a tenant or --all")
+    if args.command == "list":
+        print("\n".join(list_tenants()))
+        return
+    if args.command == "migrate":
+        tenants = list_tenants() if args.all else [args.tenant]
+        if args.tenant not in list_tenants() + [None]:
+            parser.error(f"unknown tenant {args.tenant}")
+
+    async def run():
+        try:
+            if args.command == "create":
+                await create_tenant(args.tenant)
+                print(f"Created tenant {args.tenant}")
+                return
+            for tenant in tenants:
+                migrated = await migrate_tenant(tenant)
+                print(f"{tenant}: {'migrated' if migrated else 'up to date'}")
+        finally:
+            await tenant_engines.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
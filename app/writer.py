@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, TypeVar
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.db import current_tenant, new_session
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+WriteOp = Callable[[AsyncSession], Awaitable[T]]
+
+
+class WriteQueue:
+    """
+    Single writer per process for SQLite. Write operations are queued and
+    a writer task runs them back to back in one database transaction,
+    committing when `max_batch` operations are collected or `max_delay_ms`
+    after the first one. Each operation runs under a savepoint, so one
+    that fails is rolled back alone and only its caller sees the error.
+
+    Operations receive the writer's session and must not commit.
+    """
+
+    def __init__(self, max_batch: int = 64, max_delay_ms: float = 2):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.batches = 0
+        self.operations = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Finish the queued operations, then stop the writer"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, op: WriteOp[T]) -> T:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future))
+        return await future
+
+    async def _collect(self) -> tuple[list, bool]:
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            try:
+                item = (self._queue.get_nowait() if timeout <= 0
+                        else await asyncio.wait_for(self._queue.get(), timeout))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._commit(batch)
+
+    async def _commit(self, batch: list) -> None:
+        results = []
+        async with new_session() as session:
+            try:
+                # Take the write lock up front and keep the savepoints
+                # below nested in one transaction
+                await session.exec(text("BEGIN IMMEDIATE"))
+                for op, future in batch:
+                    try:
+                        async with session.begin_nested():
+                            results.append((future, await op(session)))
+                    except Exception as exc:
+                        if not future.done():
+                            future.set_exception(exc)
+                await session.commit()
+            except Exception as exc:
+                logger.exception("Group commit of %d operations failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+        self.batches += 1
+        self.operations += len(results)
+        for future, result in results:
+            if not future.done():
+                future.set_result(result)
+
+
+write_queue = WriteQueue(max_batch=get_settings().write_queue_max_batch,
+                         max_delay_ms=get_settings().write_queue_max_delay_ms)
+
+
+async def run_write(session: AsyncSession, op: WriteOp[T]) -> T:
+    """
+    Run a write operation and commit it: through the group-commit writer
+    when it is running, otherwise directly on the request's session. The
+    writer only serves the default database, so tenant writes commit here.
+    """
+    if write_queue.running and current_tenant.get() is None:
+        return await write_queue.submit(op)
+    result = await op(session)
+    await session.commit()
+    return result
@@ -0,0 +1,85 @@
+"""
+Rows/second for loading clients and transactions one POST per row versus
+the /bulk endpoints with a JSON array and with an NDJSON body.
+
+    python benchmarks/bench_bulk.py --rows 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(rows: int, single_rows: int) -> None:
+    import httpx
+    from app.db import get_engine
+    from main import app, lifespan
+
+    get_engine().echo = False
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app), httpx.AsyncClient(transport=transport,
+                                                base_url="http://bench") as http:
+        def clients(tag: str, count: int) -> list[dict]:
+            return [{"name": f"{tag} {i}", "age": 30,
+                     "email": f"{tag}{i}@example.com"} for i in range(count)]
+
+        start = time.perf_counter()
+        for row in clients("single", single_rows):
+            (await http.post("/clients/", json=row)).raise_for_status()
+        report("clients", "single", single_rows, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = await http.post("/clients/bulk", json=clients("array", rows))
+        report("clients", "bulk json", response.json()["inserted"],
+               time.perf_counter() - start)
+
+        body = "\n".join(json.dumps(row) for row in clients("ndjson", rows))
+        start = time.perf_counter()
+        response = await http.post("/clients/bulk", content=body,
+                                   headers={"Content-Type": "application/x-ndjson"})
+        report("clients", "bulk ndjson", response.json()["inserted"],
+               time.perf_counter() - start)
+
+        transactions = [{"amount": i, "description": "bench", "client_id": 1 + i % 100}
+                        for i in range(rows)]
+        start = time.perf_counter()
+        for row in transactions[:single_rows]:
+            (await http.post("/transactions/", json=row)).raise_for_status()
+        report("transactions", "single", single_rows, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = await http.post("/transactions/bulk", json=transactions)
+        report("transactions", "bulk json", response.json()["inserted"],
+               time.perf_counter() - start)
+
+        body = "\n".join(json.dumps(row) for row in transactions)
+        start = time.perf_counter()
+        response = await http.post("/transactions/bulk", content=body,
+                                   headers={"Content-Type": "application/x-ndjson"})
+        report("transactions", "bulk ndjson", response.json()["inserted"],
+               time.perf_counter() - start)
+
+
+def report(table: str, mode: str, rows: int, elapsed: float) -> None:
+    print(f"{table:<13} {mode:<12} {rows:>7} rows {rows / elapsed:>10.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--single-rows", type=int, default=1000,
+                        help="rows sent through the one-row endpoints")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/bench.sqlite3"
+        asyncio.run(run(args.rows, args.single_rows))
+
+
+if __name__ == "__main__":
+    main()
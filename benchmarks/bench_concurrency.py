@@ -0,0 +1,144 @@
+"""
+p99 latency of GET /clients/{id} under 200 concurrent requests, comparing
+the old blocking handlers (sync Session inside async def) with the async
+session layer in app.db. One request in ten is a slow filtered scan, one
+in ten never touches the database (/ping) and the rest are primary key
+lookups. A blocked event loop shows up as /ping waiting behind the queries.
+
+    python benchmarks/bench_concurrency.py --clients 200000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(path: str, clients: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE client (name VARCHAR(80), age INTEGER, "
+                 "email VARCHAR(80), id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO client (name, age, email) VALUES (?, ?, ?)",
+                     ((f"client {i}", 20 + i % 60, f"client{i}@example.com")
+                      for i in range(clients)))
+    conn.commit()
+    conn.close()
+
+
+def blocking_app(path: str):
+    """The handlers as they were before the async port."""
+    from fastapi import FastAPI, HTTPException
+    from sqlmodel import Session, create_engine, select
+    from app.models import Client
+
+    engine = create_engine(f"sqlite:///{path}",
+                           connect_args={"check_same_thread": False})
+    app = FastAPI()
+
+    @app.get("/clients/{client_id}")
+    async def get_client(client_id: int):
+        with Session(engine) as session:
+            client = session.get(Client, client_id)
+        if not client:
+            raise HTTPException(status_code=404, detail="Client not found")
+        return client
+
+    @app.get("/ping")
+    async def ping():
+        return {"message": "pong"}
+
+    @app.get("/slow")
+    async def slow():
+        with Session(engine) as session:
+            return session.exec(select(Client).where(Client.age == -1)).all()
+
+    return app
+
+
+def async_app(path: str):
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    from fastapi import FastAPI, HTTPException
+    from sqlmodel import select
+    from app.db import SessionDep, get_engine
+    from app.models import Client
+
+    get_engine().echo = False
+
+    app = FastAPI()
+
+    @app.get("/clients/{client_id}")
+    async def get_client(client_id: int, session: SessionDep):
+        client = await session.get(Client, client_id)
+        if not client:
+            raise HTTPException(status_code=404, detail="Client not found")
+        return client
+
+    @app.get("/ping")
+    async def ping():
+        return {"message": "pong"}
+
+    @app.get("/slow")
+    async def slow(session: SessionDep):
+        return (await session.exec(select(Client).where(Client.age == -1))).all()
+
+    return app
+
+
+async def run(app, clients: int, requests: int,
+              concurrency: int) -> dict[str, list[float]]:
+    """Fire the requests in bursts of `concurrency` that all arrive at once."""
+    import httpx
+
+    latencies = {"/clients/{id}": [], "/ping": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def one(start: float, index: int):
+            if index % 10 == 0:
+                response = await http.get("/slow")
+            elif index % 10 == 1:
+                response = await http.get("/ping")
+                latencies["/ping"].append(time.perf_counter() - start)
+            else:
+                response = await http.get(f"/clients/{random.randint(1, clients)}")
+                latencies["/clients/{id}"].append(time.perf_counter() - start)
+            response.raise_for_status()
+
+        for _ in range(0, requests, concurrency):
+            start = time.perf_counter()
+            await asyncio.gather(*(one(start, i) for i in range(concurrency)))
+    return latencies
+
+
+def report(name: str, latencies: dict[str, list[float]], elapsed: float) -> None:
+    for route, samples in latencies.items():
+        cuts = statistics.quantiles(samples, n=100)
+        print(f"{name:<10} {route:<15} p50={cuts[49] * 1000:8.1f}ms "
+              f"p99={cuts[98] * 1000:8.1f}ms")
+    print(f"{name:<10} {'total':<15} elapsed={elapsed:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        seed(path, args.clients)
+        for name, factory in (("blocking", blocking_app), ("async", async_app)):
+            start = time.perf_counter()
+            latencies = asyncio.run(run(factory(path), args.clients,
+                                        args.requests, args.concurrency))
+            report(name, latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Latency of DELETE /clients/{id} by size of the client's history: the
+set-based hard delete against the soft delete, whose response does not
+wait for the transactions to be archived.
+
+    python benchmarks/bench_delete.py --transactions 100 10000 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def seed(http, n: int, transactions: int) -> int:
+    response = await http.post("/clients/", json={
+        "name": f"history {n}", "age": 30, "email": f"history{n}@example.com"})
+    client_id = response.json()["id"]
+    rows = [{"amount": 1, "description": "bench", "client_id": client_id}] * transactions
+    for start in range(0, transactions, 10_000):
+        (await http.post("/transactions/bulk", json=rows[start:start + 10_000])
+         ).raise_for_status()
+    return client_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, nargs="+", default=[100, 10_000, 100_000])
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{directory}/bench.sqlite3"
+    import httpx
+    from app.archive import archiver
+    from main import app, lifespan
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with lifespan(app), httpx.AsyncClient(transport=transport,
+                                                    base_url="http://bench") as http:
+            print(f"{'transactions':>12} {'hard ms':>9} {'soft ms':>9} {'archive s':>10}")
+            for n, transactions in enumerate(args.transactions):
+                hard_id = await seed(http, 2 * n, transactions)
+                soft_id = await seed(http, 2 * n + 1, transactions)
+                start = time.perf_counter()
+                (await http.delete(f"/clients/{hard_id}")).raise_for_status()
+                hard = time.perf_counter() - start
+                start = time.perf_counter()
+                (await http.delete(f"/clients/{soft_id}", params={"soft": True})
+                 ).raise_for_status()
+                soft = time.perf_counter() - start
+                # The archiver runs apart from the request
+                start = time.perf_counter()
+                await archiver.join()
+                archive = time.perf_counter() - start
+                print(f"{transactions:>12} {hard * 1000:>9.1f} {soft * 1000:>9.1f} "
+                      f"{archive:>10.2f}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
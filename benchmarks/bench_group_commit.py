@@ -0,0 +1,109 @@
+"""
+Write throughput of POST /transactions/ with several worker processes on
+one SQLite file, committing per request against WRITE_QUEUE=1 group
+commits. Each process runs the app in process and keeps `--concurrency`
+requests in flight; "database is locked" failures count as errors.
+
+    python benchmarks/bench_group_commit.py --workers 4 --concurrency 32
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def prepare(path: str, clients: int) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    import httpx
+    from main import app, lifespan
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with lifespan(app), httpx.AsyncClient(transport=transport,
+                                                    base_url="http://bench") as http:
+            for n in range(clients):
+                response = await http.post("/clients/", json={
+                    "name": f"writer {n}", "age": 30, "email": f"writer{n}@example.com"})
+                response.raise_for_status()
+
+    asyncio.run(run())
+
+
+def worker(path: str, write_queue: bool, synchronous: str, clients: int,
+           requests: int, concurrency: int) -> tuple[list[float], int, float]:
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ["WRITE_QUEUE"] = "1" if write_queue else "0"
+    os.environ["SQLITE_SYNCHRONOUS"] = synchronous
+    import httpx
+    from main import app, lifespan
+
+    latencies: list[float] = []
+    errors = 0
+
+    async def run() -> float:
+        nonlocal errors
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with lifespan(app), httpx.AsyncClient(transport=transport,
+                                                    base_url="http://bench") as http:
+            remaining = iter(range(requests))
+
+            async def one():
+                nonlocal errors
+                for n in remaining:
+                    start = time.perf_counter()
+                    response = await http.post("/transactions/", json={
+                        "amount": 1, "description": "bench",
+                        "client_id": 1 + n % clients})
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code >= 500:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(concurrency)))
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    return latencies, errors, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="requests in flight per worker")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="requests per worker")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--synchronous", default="FULL",
+                        help="SQLITE_SYNCHRONOUS, FULL makes every commit fsync")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for write_queue in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite3")
+            with context.Pool(1) as pool:
+                pool.apply(prepare, (path, args.clients))
+            with context.Pool(args.workers) as pool:
+                results = pool.starmap(worker, [
+                    (path, write_queue, args.synchronous, args.clients,
+                     args.requests, args.concurrency)] * args.workers)
+        # Measured inside the workers, so imports and startup are excluded
+        elapsed = max(elapsed for _, _, elapsed in results)
+        latencies = sorted(latency for samples, _, _ in results for latency in samples)
+        errors = sum(errors for _, errors, _ in results)
+        cuts = statistics.quantiles(latencies, n=100)
+        name = "group" if write_queue else "per-request"
+        print(f"{name:<12} {(len(latencies) - errors) / elapsed:8.0f} writes/s  "
+              f"p50={cuts[49] * 1000:7.1f}ms  p99={cuts[98] * 1000:8.1f}ms  "
+              f"errors={errors}")
+
+
+if __name__ == "__main__":
+    main()
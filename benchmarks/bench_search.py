@@ -0,0 +1,95 @@
+"""
+Latency of GET /clients/search on a large client table: text prefix
+queries through the FTS5 index, email prefix, age range and subscription
+status filters.
+
+    python benchmarks/bench_search.py --clients 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST = ["ana", "bruno", "carla", "diego", "elena", "fabio", "gloria", "hugo",
+         "irene", "jorge", "karen", "luis", "marta", "nicolas", "olga", "pablo"]
+LAST = ["gomez", "ruiz", "diaz", "lopez", "perez", "sanchez", "romero", "torres",
+        "flores", "rivera", "vargas", "castro", "ortiz", "silva", "rojas", "mendez"]
+
+QUERIES = {
+    "q=word": {"q": "marta"},
+    "q=two prefixes": {"q": "mar tor"},
+    "q=email prefix word": {"q": "client12345"},
+    "email prefix": {"email": "client99"},
+    "age range": {"min_age": 30, "max_age": 31},
+    "age + q": {"q": "hugo ortiz", "min_age": 60},
+    "status": {"suscription_status": "inactive"},
+}
+
+
+def seed(path: str, clients: int) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    from sqlalchemy import create_engine
+    from sqlmodel import SQLModel
+    import app.search  # noqa: F401 - registers the FTS5 DDL
+
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO client (name, age, email) VALUES (?, ?, ?)",
+        ((f"{random.choice(FIRST)} {random.choice(LAST)}", random.randint(18, 90),
+          f"client{i}@example.com") for i in range(clients)))
+    conn.execute("INSERT INTO suscription (name, price) VALUES ('Pro', 10)")
+    conn.executemany(
+        "INSERT INTO clientsuscription (client_id, suscription_id, status) "
+        "VALUES (?, 1, ?)",
+        ((i, "active" if i % 50 else "inactive") for i in range(1, clients + 1, 3)))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+async def run(repeat: int) -> None:
+    import httpx
+    from main import app, lifespan
+
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app), httpx.AsyncClient(transport=transport,
+                                                base_url="http://bench") as http:
+        for name, params in QUERIES.items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await http.get("/clients/search",
+                                          params={**params, "limit": 50})
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+            print(f"{name:<22} {len(response.json()):>3} rows  "
+                  f"median={statistics.median(samples) * 1000:7.2f}ms  "
+                  f"max={max(samples) * 1000:7.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "search.sqlite3")
+        start = time.perf_counter()
+        seed(path, args.clients)
+        print(f"seeded {args.clients} clients in {time.perf_counter() - start:.1f}s")
+        asyncio.run(run(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
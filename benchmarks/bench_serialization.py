@@ -0,0 +1,71 @@
+"""
+Encoding cost of a list response: FastAPI's response_model path (validate
+ORM objects with Pydantic, jsonable output, stdlib json) against the
+FAST_JSON path (row tuples straight to bytes with a precompiled
+RowEncoder). Rows are built in memory so only serialization is measured.
+
+    python benchmarks/bench_serialization.py --rows 10000 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.models import Client, Transaction
+from app.serializers import orjson, row_encoder
+
+
+def rows_for(model, count: int) -> list[tuple]:
+    now = datetime(2026, 1, 1, 12, 30)
+    if model is Client:
+        return [(f"client {i}", 20 + i % 60, f"client{i}@example.com", i + 1)
+                for i in range(count)]
+    return [(i % 500, f"payment {i}", i + 1, 1 + i % 1000, now) for i in range(count)]
+
+
+async def default_path(model, objects) -> bytes:
+    field = create_model_field("Response", list[model], mode="serialization")
+    content = await serialize_response(field=field, response_content=objects)
+    # What JSONResponse.render does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def measure(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if orjson else 'no (stdlib json fallback)'}")
+    for model in (Client, Transaction):
+        encoder = row_encoder(model)
+        for count in args.rows:
+            rows = rows_for(model, count)
+            objects = [model(**dict(zip(encoder.fields, row))) for row in rows]
+            slow = measure(lambda: asyncio.run(default_path(model, objects)))
+            fast = measure(lambda: encoder.encode(rows))
+            assert json.loads(asyncio.run(default_path(model, objects))) == \
+                json.loads(encoder.encode(rows))
+            print(f"{model.__name__:<12} {count:>7} rows  response_model "
+                  f"{slow * 1000:8.1f}ms  fast {fast * 1000:7.1f}ms  "
+                  f"x{slow / fast:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
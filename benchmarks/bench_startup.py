@@ -0,0 +1,107 @@
+"""
+Cold start of a worker: importing `main` and running the lifespan, each
+in a fresh interpreter like a new worker would be. The first boot on an
+empty database creates the schema; later boots find the schema
+fingerprint current and skip create_all.
+
+Warm boots run against `--rows` clients, each with one transaction, so
+startup work that grows with the tables shows up.
+
+    python benchmarks/bench_startup.py --runs 5 --budget 3 --lifespan-budget 0.5 --rows 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child() -> None:
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from main import app, lifespan
+    imported = time.perf_counter()
+
+    async def boot():
+        async with lifespan(app):
+            return time.perf_counter()
+
+    ready = asyncio.run(boot())
+    print(json.dumps({"import_s": imported - start, "lifespan_s": ready - imported,
+                      "schema_migrated": app.state.schema_migrated}))
+
+
+def seed(path: str, rows: int) -> None:
+    """Add `rows` clients with one transaction each, straight through sqlite3"""
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO client (name, age, email, updated_at) "
+            "VALUES (?, 30, ?, '2026-01-01 00:00:00')",
+            ((f"seed {n}", f"seed{n}@example.com") for n in range(rows)))
+        conn.execute(
+            "INSERT INTO \"transaction\" (amount, description, client_id, created_at, updated_at) "
+            "SELECT 1, 'seed', id, '2026-01-01 00:00:00', '2026-01-01 00:00:00' "
+            "FROM client")
+        # Derived tables as the app keeps them, so startup has nothing to backfill
+        conn.execute("INSERT INTO clientbalance (client_id, balance, transaction_count, "
+                     "updated_at) SELECT id, 1, 1, '2026-01-01 00:00:00' FROM client")
+        conn.execute("INSERT INTO dailyrevenue (day, amount, transaction_count) "
+                     "VALUES ('2026-01-01', ?, ?)", (rows, rows))
+
+
+def boot(path: str) -> dict:
+    """Start the app once in a new process on the database at `path`"""
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{path}",
+           "QUERY_PLAN_AUDIT": "0"}
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                            env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None,
+                        help="fail if a warm boot's median exceeds this many seconds")
+    parser.add_argument("--lifespan-budget", type=float, default=None,
+                        help="fail if a warm lifespan's median exceeds this many seconds, "
+                             "i.e. if startup work grows with the tables")
+    parser.add_argument("--rows", type=int, default=100_000,
+                        help="clients in the database of warm boots")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    boots = {"cold": [], "warm": []}
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "startup.sqlite3")
+            boots["cold"].append(boot(path))
+            seed(path, args.rows)
+            boots["warm"].append(boot(path))
+    for name, samples in boots.items():
+        imports = statistics.median(sample["import_s"] for sample in samples)
+        lifespans = statistics.median(sample["lifespan_s"] for sample in samples)
+        migrated = sum(sample["schema_migrated"] for sample in samples)
+        print(f"{name:<5} import={imports * 1000:7.1f}ms  lifespan={lifespans * 1000:7.1f}ms  "
+              f"total={(imports + lifespans) * 1000:7.1f}ms  schema migrated {migrated}/{len(samples)}")
+    warm = statistics.median(sample["import_s"] + sample["lifespan_s"]
+                             for sample in boots["warm"])
+    if args.budget is not None and warm > args.budget:
+        sys.exit(f"warm boot took {warm:.2f}s, over the {args.budget:.2f}s budget")
+    lifespan = statistics.median(sample["lifespan_s"] for sample in boots["warm"])
+    if args.lifespan_budget is not None and lifespan > args.lifespan_budget:
+        sys.exit(f"warm lifespan took {lifespan:.2f}s, over the "
+                 f"{args.lifespan_budget:.2f}s budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+In-process load test for every route. Drives main.app through httpx's
+ASGI transport against a freshly seeded, isolated database, runs each
+workload at each concurrency level and reports throughput and
+p50/p95/p99 latency per route.
+
+    python benchmarks/load.py --clients 50000 --concurrency 1 16 64
+    python benchmarks/load.py --save benchmarks/baseline.json
+    python benchmarks/load.py --compare benchmarks/baseline.json --threshold 0.2
+
+With --compare the exit status is 1 when a route's p95 latency grew, or
+its throughput dropped, by more than the threshold.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@dataclass
+class SeedConfig:
+    clients: int = 10_000
+    plans: int = 20
+    transactions_per_client: int = 5
+    suscriptions_per_client: int = 1
+
+
+@dataclass
+class LoadState:
+    seed: SeedConfig
+    emails: itertools.count = field(default_factory=itertools.count)
+    created: list[int] = field(default_factory=list)
+
+    def client_id(self) -> int:
+        return random.randint(1, self.seed.clients)
+
+
+Operation = Callable[["httpx.AsyncClient", LoadState], Awaitable[tuple[str, "httpx.Response"]]]
+
+
+async def catalog(http, state):
+    return "GET /suscriptions/", await http.get("/suscriptions/")
+
+
+async def list_clients(http, state):
+    return "GET /clients/", await http.get("/clients/", params={"limit": 50})
+
+
+async def get_client(http, state):
+    return "GET /clients/{client_id}", await http.get(f"/clients/{state.client_id()}")
+
+
+async def create_client(http, state):
+    n = next(state.emails)
+    response = await http.post("/clients/", json={"name": f"load {n}", "age": 30,
+                                                  "email": f"load{n}@bench.example.com"})
+    if response.status_code == 200:
+        state.created.append(response.json()["id"])
+    return "POST /clients/", response
+
+
+async def update_client(http, state):
+    client_id = random.choice(state.created) if state.created else state.client_id()
+    return "PATCH /clients/{client_id}", await http.patch(
+        f"/clients/{client_id}", json={"age": random.randint(18, 90)})
+
+
+async def delete_client(http, state):
+    if not state.created:
+        return await create_client(http, state)
+    client_id = state.created.pop()
+    return "DELETE /clients/{client_id}", await http.delete(f"/clients/{client_id}")
+
+
+async def create_transaction(http, state):
+    return "POST /transactions/", await http.post("/transactions/", json={
+        "amount": random.randint(1, 500), "description": "load",
+        "client_id": state.client_id()})
+
+
+async def list_transactions(http, state):
+    return "GET /transactions/", await http.get("/transactions/", params={"limit": 50})
+
+
+async def client_suscriptions(http, state):
+    return "GET /clients/{client_id}/suscriptions", await http.get(
+        f"/clients/{state.client_id()}/suscriptions")
+
+
+async def batch_suscriptions(http, state):
+    ids = ",".join(str(state.client_id()) for _ in range(100))
+    return "GET /clients/suscriptions", await http.get("/clients/suscriptions",
+                                                       params={"ids": ids})
+
+
+async def invoice(http, state):
+    return "POST /transactions/invoice/", await http.post(
+        "/transactions/invoice/", json={"client_id": state.client_id()})
+
+
+WORKLOADS: dict[str, list[tuple[int, Operation]]] = {
+    "catalog": [(1, catalog)],
+    "client_crud": [(4, get_client), (2, list_clients), (2, create_client),
+                    (1, update_client), (1, delete_client)],
+    "transaction_writes": [(4, create_transaction), (1, list_transactions),
+                           (1, invoice)],
+    "suscription_lookups": [(4, client_suscriptions), (1, batch_suscriptions)],
+}
+WORKLOADS["mixed"] = [entry for name in list(WORKLOADS) for entry in WORKLOADS[name]]
+
+
+async def seed_database(config: SeedConfig) -> None:
+    from sqlalchemy import insert
+    from app.db import new_session
+    from app.emails import email_registry
+    from app.ledger import rebuild_balances
+    from app.models import Client, ClientSuscription, Suscription, Transaction
+
+    async with new_session() as session:
+        await session.exec(insert(Suscription), params=[
+            {"name": f"Plan {i}", "price": 5 * (i + 1)} for i in range(config.plans)])
+        for start in range(0, config.clients, 5000):
+            ids = range(start + 1, min(start + 5000, config.clients) + 1)
+            await session.exec(insert(Client), params=[
+                {"id": i, "name": f"client {i}", "age": 18 + i % 70,
+                 "email": f"client{i}@seed.example.com"} for i in ids])
+            await session.exec(insert(Transaction), params=[
+                {"client_id": i, "amount": 1 + (i * n) % 300, "description": "seed"}
+                for i in ids for n in range(config.transactions_per_client)])
+            await session.exec(insert(ClientSuscription), params=[
+                {"client_id": i, "suscription_id": 1 + (i + n) % config.plans,
+                 "status": "active" if (i + n) % 4 else "inactive"}
+                for i in ids for n in range(config.suscriptions_per_client)])
+        await rebuild_balances(session)
+        await session.commit()
+    await email_registry.reload()
+
+
+async def run_level(http, state: LoadState, operations: list[tuple[int, Operation]],
+                    concurrency: int, requests: int) -> dict[str, dict]:
+    weights = [weight for weight, _ in operations]
+    ops = [op for _, op in operations]
+    samples: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    remaining = itertools.count(requests, -1)
+
+    async def worker():
+        while next(remaining) > 0:
+            op = random.choices(ops, weights)[0]
+            start = time.perf_counter()
+            label, response = await op(http, state)
+            samples.setdefault(label, []).append(time.perf_counter() - start)
+            if response.status_code >= 500:
+                errors[label] = errors.get(label, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {label: summarize(latencies, elapsed, errors.get(label, 0))
+            for label, latencies in sorted(samples.items())}
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    ordered = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {"count": len(ordered), "errors": errors,
+            "throughput": len(ordered) / elapsed,
+            "mean_ms": statistics.fmean(ordered) * 1000,
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+
+async def run_suite(seed: SeedConfig, workloads: list[str], levels: list[int],
+                    requests: int) -> dict:
+    import httpx
+    from main import app, lifespan
+
+    results: dict[str, dict] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app), httpx.AsyncClient(transport=transport,
+                                                base_url="http://load") as http:
+        await seed_database(seed)
+        state = LoadState(seed=seed)
+        for name in workloads:
+            results[name] = {}
+            for concurrency in levels:
+                results[name][str(concurrency)] = await run_level(
+                    http, state, WORKLOADS[name], concurrency, requests)
+    return {"seed": seed.__dict__, "requests_per_level": requests, "results": results}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Routes whose p95 grew, or throughput fell, by more than `threshold`"""
+    regressions = []
+    for workload, levels in current["results"].items():
+        for level, routes in levels.items():
+            for route, stats in routes.items():
+                base = baseline.get("results", {}).get(workload, {}).get(level, {}).get(route)
+                if not base:
+                    continue
+                where = f"{workload} c={level} {route}"
+                if stats["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                    regressions.append(f"{where}: p95 {base['p95_ms']:.1f}ms -> "
+                                       f"{stats['p95_ms']:.1f}ms")
+                if stats["throughput"] < base["throughput"] * (1 - threshold):
+                    regressions.append(f"{where}: throughput {base['throughput']:.0f} -> "
+                                       f"{stats['throughput']:.0f} req/s")
+    return regressions
+
+
+def print_report(report: dict) -> None:
+    for workload, levels in report["results"].items():
+        for level, routes in levels.items():
+            print(f"\n{workload} (concurrency {level})")
+            for route, stats in routes.items():
+                print(f"  {route:<40} {stats['throughput']:>8.0f} req/s  "
+                      f"p50 {stats['p50_ms']:7.1f}ms  p95 {stats['p95_ms']:7.1f}ms  "
+                      f"p99 {stats['p99_ms']:7.1f}ms  errors {stats['errors']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=SeedConfig.clients)
+    parser.add_argument("--plans", type=int, default=SeedConfig.plans)
+    parser.add_argument("--transactions-per-client", type=int,
+                        default=SeedConfig.transactions_per_client)
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS),
+                        choices=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=1000,
+                        help="requests per workload and concurrency level")
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to check against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    seed = SeedConfig(clients=args.clients, plans=args.plans,
+                      transactions_per_client=args.transactions_per_client)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/load.sqlite3"
+        report = asyncio.run(run_suite(seed, args.workloads, args.concurrency,
+                                       args.requests))
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
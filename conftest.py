@@ -1,14 +1,22 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.pool import StaticPool
 from sqlmodel import SQLModel, Session
+
+# Point the app at an isolated database before it is imported
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./test.sqlite3")
+# Every query the routers issue in tests must be index backed
+os.environ.setdefault("QUERY_PLAN_AUDIT", "1")
+
 from main import app
+from app.auth import credential_cache
+from app.client_cache import client_cache
+from app.routers.suscriptions import catalog_cache
 
-DATABASE_URL = "sqlite:///./db.sqlite3"
-engine = create_engine(DATABASE_URL, 
-                       connect_args={"check_same_thread": False},
-                       poolclass=StaticPool)
+DATABASE_URL = os.environ["DATABASE_URL"].replace("+aiosqlite", "")
+engine = create_engine(DATABASE_URL,
+                       connect_args={"check_same_thread": False})
 
 @pytest.fixture(name="session")
 def session_fixture():
@@ -21,10 +29,11 @@ def session_fixture():
 @pytest.fixture(name="client")
 def client_fixture(session: Session):
     """Create a new FastAPI test client."""
-    # def override_get_session():
-    #     return session
-    # app.dependency_overrides[Session] = override_get_session
-    app.dependency_overrides[Session] = lambda: session
-    client = TestClient(app)
-    yield client
-    app.dependency_overrides.clear()
\ No newline at end of file
+    # The context manager runs the lifespan and keeps one event loop
+    # for the async engine during the whole test
+    with TestClient(app) as client:
+        yield client
+    # The database is dropped below the API, so drop cached responses too
+    catalog_cache.invalidate()
+    credential_cache.invalidate()
+    client_cache.invalidate()
@@ -1,20 +1,71 @@
-from typing import Annotated
-from fastapi import Depends, FastAPI
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from app.db import create_all_tables
-from app.routers import clients, transactions, misc, suscriptions
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from app.auth import UserDep
+from app.config import get_settings
+from app.db import (create_all_tables, get_engine, get_read_engine, new_session,
+                    tenant_engines)
+from app.analytics import ensure_rollups
+from app.archive import archiver
+from app.client_cache import client_cache
+from app.emails import email_registry
+from app.ledger import ensure_balances
+from app.metrics import MetricsMiddleware, instrument_engine
+from app.query_audit import query_auditor
+from app.tenants import TenantMiddleware
+from app.writer import write_queue
+from app.routers import (admin, analytics, billing, changes, clients, transactions, misc,
+                         suscriptions, users)
 
-app = FastAPI(lifespan=create_all_tables)
+@asynccontextmanager
+async def lifespan(app):
+    engines = get_engine(), get_read_engine()
+    if get_settings().metrics:
+        instrument_engine(*engines)
+        tenant_engines.hooks.append(instrument_engine)
+    audit = get_settings().query_plan_audit
+    if audit:
+        query_auditor.install(*engines)
+        tenant_engines.hooks.append(query_auditor.install)
+    async with create_all_tables(app):
+        async with new_session() as session:
+            await ensure_balances(session)
+            await ensure_rollups(session)
+        email_registry.start()
+        await archiver.start()
+        tenant_engines.open_hooks.append(archiver.resume)
+        if get_settings().write_queue:
+            write_queue.start()
+        if get_settings().client_cache_sync_ms:
+            await client_cache.start_sync(get_settings().client_cache_sync_ms)
+        yield
+        await client_cache.stop_sync()
+        await email_registry.stop()
+        await archiver.stop()
+        await write_queue.stop()
+    if audit:
+        query_auditor.uninstall(*engines)
+    tenant_engines.hooks.clear()
+    tenant_engines.open_hooks.clear()
+
+app = FastAPI(lifespan=lifespan)
+
+# Added first so it runs inside the metrics middleware
+app.add_middleware(TenantMiddleware)
+if get_settings().metrics:
+    app.add_middleware(MetricsMiddleware)
 
 # Include the routers
 app.include_router(clients.router)
 app.include_router(transactions.router)
 app.include_router(suscriptions.router)
-# app.include_router(misc.router)
-
-security = HTTPBasic()
+app.include_router(users.router)
+app.include_router(billing.router)
+app.include_router(analytics.router)
+app.include_router(changes.router)
+app.include_router(admin.router)
+app.include_router(misc.router)
 
 @app.get("/")
-async def root(credencials: Annotated[HTTPBasicCredentials, Depends(security)]):
+async def root(user_id: UserDep):
     return {"message": "Welcome to the API"}
 
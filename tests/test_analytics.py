@@ -0,0 +1,129 @@
+import asyncio
+from sqlalchemy import delete
+from sqlmodel import select
+from app.analytics import ensure_rollups, rebuild_rollups, verify_rollups
+from app.db import new_session
+from app.models import (DailyRevenue, LinkEvent, LinkEventKind, PlanDailyStats,
+                        PlanStats, utcnow)
+
+
+def verify():
+    async def run():
+        async with new_session() as session:
+            return await verify_rollups(session)
+    return asyncio.run(run())
+
+
+def seed(client):
+    plan = client.post("/suscriptions/", json={"name": "Pro", "price": 20}).json()
+    links = []
+    for n in range(4):
+        created = client.post("/clients/", json={"name": f"Analytic {n}", "age": 30,
+                                                 "email": f"analytic{n}@example.com"}).json()
+        link = client.post(f"/clients/{created['id']}/suscribe/{plan['id']}",
+                           params={"suscription_status": "active"}).json()
+        links.append((created["id"], link["id"]))
+    return plan, links
+
+
+def test_plan_rollups_follow_status_changes(client):
+    plan, links = seed(client)
+    client_id, link_id = links[0]
+    response = client.patch(f"/clients/{client_id}/suscriptions/{link_id}",
+                            params={"suscription_status": "inactive"})
+    assert response.json()["ended_at"] is not None
+
+    [summary] = client.get("/analytics/plans").json()
+    assert summary["suscription_id"] == plan["id"]
+    assert (summary["active"], summary["inactive"], summary["mrr"]) == (3, 1, 60)
+
+    today = utcnow().date().isoformat()
+    days = client.get("/analytics/subscribers", params={"start": today}).json()
+    assert days == [{"day": today, "started": 4, "churned": 1,
+                     "active": 3, "churn_rate": 0.25}]
+    assert client.patch(f"/clients/{links[1][0]}/suscriptions/{link_id}",
+                        params={"suscription_status": "active"}).status_code == 404
+    assert verify() == []
+
+
+def test_reactivation_keeps_past_churn(client, session):
+    plan, links = seed(client)
+    client_id, link_id = links[0]
+    for suscription_status in ("inactive", "active"):
+        client.patch(f"/clients/{client_id}/suscriptions/{link_id}",
+                     params={"suscription_status": suscription_status})
+
+    today = utcnow().date().isoformat()
+    days = client.get("/analytics/subscribers", params={"start": today}).json()
+    assert days == [{"day": today, "started": 5, "churned": 1,
+                     "active": 4, "churn_rate": 0.2}]
+    events = session.exec(select(LinkEvent.kind).where(LinkEvent.link_id == link_id)
+                          .order_by(LinkEvent.id)).all()
+    assert events == [LinkEventKind.started, LinkEventKind.churned, LinkEventKind.started]
+    assert verify() == []
+
+    # A purge churns the link but leaves its history
+    client.delete(f"/clients/{client_id}")
+    [day] = client.get("/analytics/subscribers", params={"start": today}).json()
+    assert (day["started"], day["churned"], day["active"]) == (5, 2, 3)
+    assert verify() == []
+
+
+def test_revenue_rollup_counts_every_insert_path(client):
+    plan, links = seed(client)
+    client.post("/transactions/", json={"amount": 5, "description": "one",
+                                        "client_id": links[0][0]})
+    client.post("/transactions/bulk", json=[
+        {"amount": 7, "description": "bulk", "client_id": client_id}
+        for client_id, _ in links])
+    client.post("/billing/runs", params={"period": "2026-10"})
+
+    today = utcnow().date().isoformat()
+    days = client.get("/analytics/revenue", params={"start": today, "end": today}).json()
+    assert days == [{"day": today, "amount": 5 + 4 * 7 + 4 * 20,
+                     "transaction_count": 9}]
+    assert verify() == []
+
+
+def test_rebuild_repairs_drift(client):
+    seed(client)
+
+    async def corrupt_and_rebuild():
+        async with new_session() as session:
+            stats = (await session.exec(select(PlanStats)
+                                        .where(PlanStats.suscription_id > 0))).first()
+            stats.active += 10
+            session.add(stats)
+            await session.commit()
+            mismatches = await verify_rollups(session)
+            await rebuild_rollups(session)
+            await session.commit()
+            return mismatches
+
+    assert len(asyncio.run(corrupt_and_rebuild())) == 1
+    assert verify() == []
+
+
+def test_link_history_backfilled_from_links(client):
+    plan, links = seed(client)
+    client.patch(f"/clients/{links[0][0]}/suscriptions/{links[0][1]}",
+                 params={"suscription_status": "inactive"})
+
+    async def forget_and_backfill():
+        async with new_session() as session:
+            for model in (LinkEvent, PlanStats, PlanDailyStats, DailyRevenue):
+                await session.exec(delete(model))
+            await session.commit()
+            await ensure_rollups(session)
+
+    asyncio.run(forget_and_backfill())
+    assert verify() == []
+    today = utcnow().date().isoformat()
+    [day] = client.get("/analytics/subscribers", params={"start": today}).json()
+    assert (day["started"], day["churned"], day["active"]) == (4, 1, 3)
+
+
+def test_day_range_is_bounded(client):
+    response = client.get("/analytics/revenue",
+                          params={"start": "2024-01-01", "end": "2026-01-01"})
+    assert response.status_code == 422
@@ -0,0 +1,131 @@
+import asyncio
+from fastapi import status
+from sqlalchemy import text
+from sqlmodel import select
+from app.analytics import verify_rollups
+from app.archive import archive_client, archiver
+from app.db import new_session
+from app.ledger import rebuild_balances
+from app.models import (ArchiveJob, ChangeLog, ClientBalance, ClientSuscription,
+                        StatusEnum, Transaction, TransactionArchive)
+
+
+def verify():
+    async def run():
+        async with new_session() as session:
+            return await verify_rollups(session)
+    return asyncio.run(run())
+
+
+def rebuilt_balance(client_id):
+    async def run():
+        async with new_session() as session:
+            await rebuild_balances(session)
+            await session.commit()
+            return (await session.get(ClientBalance, client_id)).balance
+    return asyncio.run(run())
+
+
+def seed(client, n=0, transactions=3):
+    plan = client.post("/suscriptions/", json={"name": f"Plan {n}", "price": 10}).json()
+    created = client.post("/clients/", json={"name": f"Gone {n}", "age": 30,
+                                             "email": f"gone{n}@example.com"}).json()
+    client.post(f"/clients/{created['id']}/suscribe/{plan['id']}",
+                params={"suscription_status": "active"})
+    client.post("/transactions/bulk", json=[
+        {"amount": 5, "description": "tx", "client_id": created["id"]}
+        for _ in range(transactions)])
+    return created
+
+
+def test_delete_removes_history_in_one_transaction(client, session):
+    gone, kept = seed(client), seed(client, 1)
+    response = client.delete(f"/clients/{gone['id']}")
+    assert response.status_code == status.HTTP_200_OK
+
+    def count(model, client_id):
+        return len(session.exec(select(model).where(model.client_id == client_id)).all())
+    assert [count(model, gone["id"]) for model in
+            (Transaction, ClientSuscription, ClientBalance)] == [0, 0, 0]
+    assert [count(model, kept["id"]) for model in
+            (Transaction, ClientSuscription, ClientBalance)] == [3, 1, 1]
+    assert verify() == []
+    deleted = session.exec(select(ChangeLog.entity)
+                           .where(ChangeLog.action == "delete")).all()
+    assert sorted(deleted) == ["client", "clientsuscription"] + ["transaction"] * 3
+    # The email is free again
+    assert client.post("/clients/", json={"name": "Back", "age": 30,
+                                          "email": gone["email"]}).status_code == 200
+
+
+def test_soft_delete_archives_in_the_background(client, session):
+    gone = seed(client, transactions=5)
+    response = client.delete(f"/clients/{gone['id']}", params={"soft": True})
+    assert response.status_code == status.HTTP_200_OK
+    client.portal.call(archiver.join)
+
+    assert client.get(f"/clients/{gone['id']}").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/clients/").json() == []
+    assert client.get("/clients/search", params={"q": "Gone"}).json() == []
+    assert client.get("/clients/batch", params={"ids": gone["id"]}).json()["missing"] \
+        == [gone["id"]]
+    assert client.post("/transactions/", json={"amount": 1, "description": "late",
+                                               "client_id": gone["id"]}).status_code \
+        == status.HTTP_404_NOT_FOUND
+    assert client.delete(f"/clients/{gone['id']}", params={"soft": True}).status_code \
+        == status.HTTP_404_NOT_FOUND
+
+    job = client.get(f"/clients/{gone['id']}/archive").json()
+    assert (job["status"], job["archived"]) == ("completed", 5)
+    assert session.exec(select(Transaction).where(Transaction.client_id == gone["id"])).all() == []
+    assert len(session.exec(select(TransactionArchive)
+                            .where(TransactionArchive.client_id == gone["id"])).all()) == 5
+    link = session.exec(select(ClientSuscription)
+                        .where(ClientSuscription.client_id == gone["id"])).one()
+    assert link.status == StatusEnum.inactive
+    # Archived transactions still count
+    assert verify() == []
+    assert rebuilt_balance(gone["id"]) == 25
+
+    # Reserved until the client is deleted for good, archive included
+    assert client.post("/clients/", json={"name": "Back", "age": 30,
+                                          "email": gone["email"]}).status_code \
+        == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.delete(f"/clients/{gone['id']}").status_code == status.HTTP_200_OK
+    assert session.exec(select(TransactionArchive)
+                        .where(TransactionArchive.client_id > 0)).all() == []
+    assert verify() == []
+    # Left the search index once, when flagged
+    session.exec(text("INSERT INTO client_fts(client_fts) VALUES ('integrity-check')"))
+    session.commit()
+    assert client.get(f"/clients/{gone['id']}/archive").status_code \
+        == status.HTTP_404_NOT_FOUND
+    assert client.post("/clients/", json={"name": "Back", "age": 30,
+                                          "email": gone["email"]}).status_code == 200
+
+
+def test_archival_moves_batches(client, session):
+    gone = seed(client, transactions=5)
+    # Flag the client without running the background archival
+    session.add(ArchiveJob(client_id=gone["id"]))
+    session.commit()
+    asyncio.run(archive_client(gone["id"], batch_size=2))
+    session.expire_all()
+    job = session.get(ArchiveJob, gone["id"])
+    assert (job.status, job.archived) == ("completed", 5)
+    moved = session.exec(select(ChangeLog).where(ChangeLog.entity == "transaction",
+                                                 ChangeLog.action == "delete")).all()
+    assert len(moved) == 5
+
+
+def test_archiver_resumes_running_jobs_on_start(client, session):
+    gone = seed(client, transactions=5)
+    # A soft delete whose archival a restart cut short
+    client.portal.call(archiver.stop)
+    client.delete(f"/clients/{gone['id']}", params={"soft": True})
+    assert client.get(f"/clients/{gone['id']}/archive").json()["status"] == "running"
+
+    client.portal.call(archiver.start)
+    client.portal.call(archiver.join)
+    job = client.get(f"/clients/{gone['id']}/archive").json()
+    assert (job["status"], job["archived"]) == ("completed", 5)
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from app.auth import create_user, credential_cache
+from app.config import get_settings
+
+alice = ("alice", "correct horse")
+
+
+@pytest.fixture(name="auth_client")
+def auth_client_fixture(client, monkeypatch):
+    assert client.portal.call(create_user, *alice) == 1
+    monkeypatch.setattr(get_settings(), "auth_enabled", True)
+    return client
+
+
+def test_auth_disabled_by_default(client):
+    assert client.get("/clients/").status_code == status.HTTP_200_OK
+
+
+def test_every_router_requires_credentials(auth_client):
+    for path in ("/", "/clients/", "/transactions/", "/suscriptions/"):
+        response = auth_client.get(path)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.headers["www-authenticate"] == "Basic"
+        assert auth_client.get(path, auth=alice).status_code == status.HTTP_200_OK
+    assert auth_client.get("/clients/", auth=("alice", "wrong")).status_code == \
+        status.HTTP_401_UNAUTHORIZED
+    assert auth_client.get("/clients/", auth=("nobody", "x")).status_code == \
+        status.HTTP_401_UNAUTHORIZED
+
+
+def test_repeat_callers_hit_the_cache(auth_client):
+    auth_client.get("/clients/", auth=alice)
+    hits = credential_cache.entries.hits
+    auth_client.get("/clients/", auth=alice)
+    assert credential_cache.entries.hits == hits + 1
+    # A cached username does not let a different password through
+    assert auth_client.get("/clients/", auth=("alice", "wrong")).status_code == \
+        status.HTTP_401_UNAUTHORIZED
+
+
+def test_password_change_invalidates_cache(auth_client):
+    assert auth_client.get("/clients/", auth=alice).status_code == status.HTTP_200_OK
+    response = auth_client.patch("/users/1", auth=alice,
+                                 json={"password": "new password"})
+    assert response.status_code == status.HTTP_200_OK
+    assert auth_client.get("/clients/", auth=alice).status_code == \
+        status.HTTP_401_UNAUTHORIZED
+    assert auth_client.get("/clients/", auth=("alice", "new password")).status_code == \
+        status.HTTP_200_OK
+
+
+def test_users_are_not_created_over_http(client):
+    response = client.post("/users/", json={"username": "bob", "password": "password1"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_duplicate_username(client):
+    client.portal.call(create_user, "bob", "password1")
+    with pytest.raises(IntegrityError):
+        client.portal.call(create_user, "bob", "password2")
+    with pytest.raises(ValidationError):
+        client.portal.call(create_user, "carol", "short")
@@ -0,0 +1,55 @@
+import asyncio
+from fastapi import status
+from sqlalchemy import event
+from app.db import get_engine, new_session
+from app.dependencies import Loader
+from app.models import Client
+
+
+def create_clients(client, count):
+    return [client.post("/clients/", json={"name": f"Batch {n}", "age": 30,
+                                           "email": f"batch{n}@example.com"}).json()["id"]
+            for n in range(count)]
+
+
+def test_clients_batch(client):
+    ids = create_clients(client, 3)
+    response = client.get("/clients/batch", params={"ids": f"{ids[2]},999,{ids[0]},{ids[2]}"})
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert [row["id"] for row in body["clients"]] == [ids[2], ids[0]]
+    assert body["missing"] == [999]
+    assert client.get("/clients/batch", params={"ids": "x"}).status_code == 422
+
+
+def test_suscriptions_batch(client):
+    plan = client.post("/suscriptions/", json={"name": "Pro", "price": 20}).json()
+    body = client.get("/suscriptions/batch", params={"ids": f"{plan['id']},42"}).json()
+    assert [row["name"] for row in body["suscriptions"]] == ["Pro"]
+    assert body["missing"] == [42]
+
+
+def test_loader_coalesces_lookups(client):
+    ids = create_clients(client, 3)
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    async def run():
+        async with new_session() as session:
+            loader = Loader(session)
+            first = await asyncio.gather(*(loader.load(Client, client_id)
+                                           for client_id in [*ids, 999]))
+            again = await loader.load_many(Client, [ids[0], 999])
+            return first, again
+
+    event.listen(get_engine().sync_engine, "before_cursor_execute", count)
+    try:
+        first, again = asyncio.run(run())
+    finally:
+        event.remove(get_engine().sync_engine, "before_cursor_execute", count)
+    assert [row.id if row else None for row in first] == [*ids, None]
+    assert again == {ids[0]: first[0], 999: None}
+    assert len(statements) == 1
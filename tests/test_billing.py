@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from fastapi import status
+from app import billing
+
+
+def seed(client, subscribers=7):
+    plan = client.post("/suscriptions/", json={"name": "Pro", "price": 20}).json()
+    ids = []
+    for n in range(subscribers):
+        created = client.post("/clients/", json={"name": f"Sub {n}", "age": 30,
+                                                 "email": f"sub{n}@example.com"}).json()
+        state = "inactive" if n == 0 else "active"
+        client.post(f"/clients/{created['id']}/suscribe/{plan['id']}",
+                    params={"suscription_status": state})
+        ids.append(created["id"])
+    return ids
+
+
+def test_billing_run_charges_active_subscriptions_once(client):
+    ids = seed(client)
+    response = client.post("/billing/runs", params={"period": "2026-10",
+                                                    "chunk_size": 2, "workers": 3})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    report = client.get("/billing/runs/2026-10").json()
+    assert report["status"] == "completed"
+    assert (report["charged"], report["amount"]) == (6, 120)
+    assert report["chunks_done"] == report["chunks"] == 4
+    assert client.get(f"/clients/{ids[0]}/balance").json()["balance"] == 0
+    assert client.get(f"/clients/{ids[1]}/balance").json()["balance"] == 20
+
+    # A second run for the same period bills nothing
+    client.post("/billing/runs", params={"period": "2026-10"})
+    assert client.get(f"/clients/{ids[1]}/balance").json()["balance"] == 20
+    assert client.get("/billing/runs/2026-11").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_period_must_be_year_and_month(client):
+    for period in ("2026-1", "2026-13", "2026-10-01", "october"):
+        response = client.post("/billing/runs", params={"period": period})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert client.get(f"/billing/runs/{period}").status_code \
+            == status.HTTP_422_UNPROCESSABLE_ENTITY
+    with pytest.raises(ValueError):
+        asyncio.run(billing.run_billing("2026-1"))
+
+
+def test_interrupted_run_resumes(client, monkeypatch):
+    seed(client)
+    bill_chunk = billing.bill_chunk
+
+    async def failing(run, chunk_start):
+        if chunk_start == 5:
+            raise RuntimeError("worker died")
+        return await bill_chunk(run, chunk_start)
+
+    monkeypatch.setattr(billing, "bill_chunk", failing)
+    with pytest.raises(ExceptionGroup):
+        asyncio.run(billing.run_billing("2026-10", workers=1, chunk_size=2))
+    report = client.get("/billing/runs/2026-10").json()
+    assert report["status"] == "running"
+    assert report["chunks_done"] == 2
+
+    monkeypatch.setattr(billing, "bill_chunk", bill_chunk)
+    report = asyncio.run(billing.run_billing("2026-10", workers=2))
+    assert report.status == "completed"
+    assert (report.charged, report.chunks_done) == (6, 4)
+    assert report.rows_per_second > 0
+    response = client.get("/transactions/", params={"limit": 100})
+    assert len(response.json()) == 6
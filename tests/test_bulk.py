@@ -0,0 +1,61 @@
+import asyncio
+import json
+from fastapi import status
+from app.bulk import insert_chunk
+from app.db import new_session
+from app.models import BulkResult, Client
+
+
+def test_bulk_clients_json(client):
+    rows = [{"name": f"Bulk {i}", "age": 30, "email": f"bulk{i}@example.com"}
+            for i in range(3)]
+    rows.append({"name": "Dup", "age": 30, "email": "bulk0@example.com"})
+    rows.append({"name": "Bad", "age": "old", "email": "bad@example.com"})
+    response = client.post("/clients/bulk", json=rows)
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["inserted"] == 3
+    assert sorted(error["index"] for error in data["errors"]) == [3, 4]
+
+    response = client.post("/clients/bulk", json=rows[:1])
+    assert response.json()["errors"][0]["errors"][0] == {
+        "type": "value_error", "loc": ["email"], "msg": "Email already exists"}
+
+
+def test_bulk_conflict_fallback_reports_the_field(client):
+    client.post("/clients/", json={"name": "First", "age": 30, "email": "race@example.com"})
+    # Inserted by someone else after the duplicate check read the table
+    row = {"name": "Racer", "age": 30, "email": "race@example.com"}
+
+    async def insert():
+        async with new_session() as session:
+            result = BulkResult()
+            await insert_chunk(session, Client, [(0, row)], result,
+                               conflict="Email already exists", conflict_loc=("email",))
+            return result
+
+    result = asyncio.run(insert())
+    assert result.inserted == 0
+    assert [(error.index, error.errors[0]["loc"]) for error in result.errors] \
+        == [(0, ["email"])]
+
+
+def test_bulk_transactions_ndjson(client):
+    created = client.post("/clients/", json={"name": "Owner", "age": 40,
+                                             "email": "owner@example.com"}).json()
+    lines = [json.dumps({"amount": i, "description": "bulk",
+                         "client_id": created["id"]}) for i in range(5)]
+    lines.append(json.dumps({"amount": 1, "description": "x", "client_id": 9999999}))
+    lines.append("{not json")
+    response = client.post("/transactions/bulk", content="\n".join(lines),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["inserted"] == 5
+    assert sorted(error["index"] for error in data["errors"]) == [5, 6]
+    assert len(client.get("/transactions/").json()) == 5
+
+
+def test_bulk_rejects_non_array(client):
+    response = client.post("/clients/bulk", json={"name": "x"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
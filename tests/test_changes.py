@@ -0,0 +1,51 @@
+from fastapi import status
+
+
+def feed(client, since=None, **params):
+    if since:
+        params["since"] = since
+    response = client.get("/changes", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_feed_returns_only_new_changes(client):
+    created = client.post("/clients/", json={"name": "Sync", "age": 30,
+                                             "email": "sync@example.com"}).json()
+    assert created["updated_at"] is not None
+    client.post("/clients/bulk", json=[{"name": f"Bulk {n}", "age": 30,
+                                        "email": f"sync{n}@example.com"} for n in range(2)])
+    first = feed(client)
+    assert [(c["entity"], c["action"]) for c in first["changes"]] == [("client", "create")] * 3
+    assert first["changes"][0]["data"]["email"] == "sync@example.com"
+
+    updated = client.patch(f"/clients/{created['id']}", json={"name": "Synced"}).json()
+    assert updated["updated_at"] > created["updated_at"]
+    plan = client.post("/suscriptions/", json={"name": "Pro", "price": 20}).json()
+    link = client.post(f"/clients/{created['id']}/suscribe/{plan['id']}",
+                       params={"suscription_status": "active"}).json()
+    client.post("/transactions/", json={"amount": 5, "description": "sync",
+                                        "client_id": created["id"]})
+    second = feed(client, first["next"])
+    assert [(c["entity"], c["action"], c["entity_id"]) for c in second["changes"]] == [
+        ("client", "update", created["id"]),
+        ("clientsuscription", "create", link["id"]),
+        ("transaction", "create", 1)]
+    assert second["changes"][0]["data"]["name"] == "Synced"
+
+    client.delete(f"/clients/{first['changes'][1]['entity_id']}")
+    third = feed(client, second["next"])
+    assert [(c["action"], c["data"]) for c in third["changes"]] == [("delete", None)]
+    assert feed(client, third["next"]) == {"changes": [], "next": third["next"]}
+
+
+def test_feed_pages_with_limit(client):
+    client.post("/clients/bulk", json=[{"name": f"Page {n}", "age": 30,
+                                        "email": f"feed{n}@example.com"} for n in range(5)])
+    page = feed(client, limit=2)
+    seen = [c["entity_id"] for c in page["changes"]]
+    while page["changes"]:
+        page = feed(client, page["next"], limit=2)
+        seen += [c["entity_id"] for c in page["changes"]]
+    assert len(seen) == len(set(seen)) == 5
+    assert client.get("/changes", params={"since": "bad"}).status_code == 422
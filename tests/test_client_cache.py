@@ -0,0 +1,96 @@
+import asyncio
+from fastapi import status
+from sqlmodel import select
+from app import client_cache as client_cache_module
+from app.cache import MISSING
+from app.client_cache import client_cache
+from app.models import ChangeAction, ChangeLog, Client, ClientBalance
+
+
+def create(client, n=0):
+    return client.post("/clients/", json={"name": f"Hot {n}", "age": 30,
+                                          "email": f"hot{n}@example.com"}).json()
+
+
+def test_reads_are_cached_and_writes_invalidate(client):
+    missing = client.get("/clients/1")
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+    created = create(client)
+    first = client.get(f"/clients/{created['id']}").json()
+    assert first["email"] == created["email"]
+
+    hits = client_cache.entries.hits
+    assert client.get(f"/clients/{created['id']}").json() == first
+    other = create(client, 1)
+    client.post("/transactions/", json={"amount": 1, "description": "hot",
+                                        "client_id": created["id"]})
+    assert client_cache.entries.hits == hits + 1
+
+    client.patch(f"/clients/{created['id']}", json={"name": "Renamed"})
+    assert client.get(f"/clients/{created['id']}").json()["name"] == "Renamed"
+    client.get(f"/clients/{other['id']}")
+    client.delete(f"/clients/{other['id']}")
+    assert client.get(f"/clients/{other['id']}").status_code == status.HTTP_404_NOT_FOUND
+    assert "client_cache_hits_total" in client.get("/metrics").text
+
+
+def test_sync_drops_clients_changed_by_other_workers(client, session):
+    created = create(client)
+    asyncio.run(client_cache.poll_changes())
+    client.get(f"/clients/{created['id']}")
+
+    # Another worker renames the client and logs it
+    row = session.exec(select(Client).where(Client.id == created["id"])).one()
+    row.name = "Elsewhere"
+    session.add(row)
+    session.add(ChangeLog(entity="client", entity_id=row.id, action=ChangeAction.update))
+    session.commit()
+    assert client.get(f"/clients/{created['id']}").json()["name"] == "Hot 0"
+
+    asyncio.run(client_cache.poll_changes())
+    assert client.get(f"/clients/{created['id']}").json()["name"] == "Elsewhere"
+
+
+def test_sync_reads_only_client_changes_in_batches(client, session, monkeypatch):
+    monkeypatch.setattr(client_cache_module, "SYNC_BATCH_SIZE", 2)
+    created = [create(client, n) for n in range(3)]
+    client.post("/transactions/bulk", json=[{"amount": 1, "description": "noise",
+                                             "client_id": created[0]["id"]}] * 5)
+    client_cache.last_change_id = 0
+    for row in created:
+        client.get(f"/clients/{row['id']}")
+    asyncio.run(client_cache.poll_changes())
+
+    client_changes = session.exec(select(ChangeLog.id).where(
+        ChangeLog.entity == "client", ChangeLog.id > 0)).all()
+    assert client_cache.last_change_id == max(client_changes)
+    assert len(client_cache.entries) == 0
+
+
+def test_transaction_for_a_client_deleted_elsewhere_is_rejected(client, session):
+    created = create(client)
+    assert client.get(f"/clients/{created['id']}").status_code == status.HTTP_200_OK
+    # Another worker deletes the client; this worker's cache still has it
+    session.delete(session.get(Client, created["id"]))
+    session.commit()
+
+    response = client.post("/transactions/", json={"amount": 1, "description": "late",
+                                                   "client_id": created["id"]})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert session.get(ClientBalance, created["id"]) is None
+    assert client.get(f"/clients/{created['id']}").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_unknown_ids_are_cached_only_while_syncing(client, session):
+    assert client.get("/clients/1").status_code == status.HTTP_404_NOT_FOUND
+    # Another worker creates the client
+    session.add(Client(name="Elsewhere", age=30, email="elsewhere@example.com"))
+    session.commit()
+    assert client.get("/clients/1").json()["name"] == "Elsewhere"
+
+    client.portal.call(client_cache.start_sync, 60_000)
+    try:
+        assert client.get("/clients/2").status_code == status.HTTP_404_NOT_FOUND
+        assert client_cache.entries.get((None, 2), MISSING) is None
+    finally:
+        client.portal.call(client_cache.stop_sync)
@@ -0,0 +1,30 @@
+import asyncio
+from sqlalchemy import text
+from app.config import Settings
+from app.db import build_engine
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("POOL_SIZE", "20")
+    monkeypatch.setenv("ECHO", "true")
+    settings = Settings.from_env()
+    assert settings.pool_size == 20
+    assert settings.echo is True
+    assert settings.max_overflow == Settings().max_overflow
+
+
+def test_sqlite_pragmas(tmp_path):
+    settings = Settings(sqlite_busy_timeout_ms=1234)
+    url = f"sqlite+aiosqlite:///{tmp_path}/pragmas.sqlite3"
+
+    async def pragmas(read_only):
+        engine = build_engine(url, settings, read_only=read_only)
+        async with engine.connect() as conn:
+            values = [(await conn.execute(text(f"PRAGMA {name}"))).scalar()
+                      for name in ("journal_mode", "synchronous",
+                                   "busy_timeout", "query_only")]
+        await engine.dispose()
+        return values
+
+    assert asyncio.run(pragmas(False)) == ["wal", 1, 1234, 0]
+    assert asyncio.run(pragmas(True)) == ["wal", 1, 1234, 1]
@@ -0,0 +1,48 @@
+import pytest
+from fastapi import status
+from sqlalchemy import text
+from app.db import DuplicateValuesError, create_missing_indexes
+from app.emails import email_registry
+
+payload = {"name": "Unique", "age": 30, "email": "unique@example.com"}
+
+
+def test_duplicate_email_caught_by_unique_index(client):
+    assert client.post("/clients/", json=payload).status_code == status.HTTP_200_OK
+    # Simulate another worker having inserted the email: the registry misses
+    email_registry.discard(payload["email"])
+    response = client.post("/clients/", json=payload)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["body", "email"]
+
+
+def test_update_keeps_own_email(client):
+    created = client.post("/clients/", json=payload).json()
+    response = client.patch(f"/clients/{created['id']}",
+                            json={**payload, "name": "Renamed"})
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["name"] == "Renamed"
+
+
+def test_registry_follows_writes(client):
+    client.portal.call(email_registry.wait_loaded)
+    created = client.post("/clients/", json=payload).json()
+    assert email_registry.might_exist(payload["email"])
+    client.patch(f"/clients/{created['id']}",
+                 json={**payload, "email": "moved@example.com"})
+    assert not email_registry.might_exist(payload["email"])
+    assert email_registry.might_exist("moved@example.com")
+    client.delete(f"/clients/{created['id']}")
+    assert not email_registry.might_exist("moved@example.com")
+
+
+def test_unique_index_on_duplicates_names_them(session):
+    # A database from before the unique index
+    session.exec(text("DROP INDEX ix_client_email"))
+    for name in ("First", "Second"):
+        session.exec(text("INSERT INTO client (name, age, email) "
+                          "VALUES (:name, 30, 'twice@example.com')"), params={"name": name})
+    session.commit()
+    with pytest.raises(DuplicateValuesError, match="twice@example.com"):
+        create_missing_indexes(session.connection())
+    session.rollback()
@@ -0,0 +1,63 @@
+import csv
+import io
+import pytest
+from fastapi import status
+from app import export
+
+
+def seed(client, count=25):
+    ids = []
+    for n in range(2):
+        created = client.post("/clients/", json={"name": f"Export {n}", "age": 40,
+                                                 "email": f"export{n}@example.com"}).json()
+        ids.append(created["id"])
+    client.post("/transactions/bulk", json=[
+        {"amount": i, "description": f"row {i}", "client_id": ids[i % 2]}
+        for i in range(count)])
+    return ids
+
+
+def test_csv_export_streams_every_row(client, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+    seed(client)
+    response = client.get("/transactions/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["amount"]) for row in rows] == list(range(25))
+    assert set(rows[0]) == {"id", "client_id", "amount", "description", "created_at"}
+
+
+def test_csv_export_filters(client):
+    first, _ = seed(client)
+    response = client.get("/transactions/export", params={"client_id": first})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert {int(row["client_id"]) for row in rows} == {first}
+    assert len(rows) == 13
+
+    ids = [int(row["id"]) for row in rows]
+    response = client.get("/transactions/export",
+                          params={"min_id": ids[1], "max_id": ids[3]})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == list(range(ids[1], ids[3] + 1))
+
+    response = client.get("/transactions/export", params={"end": "2000-01-01T00:00:00"})
+    assert response.text.strip() == "amount,description,id,client_id,created_at"
+
+
+def test_parquet_export_in_row_groups(client, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+    seed(client)
+    response = client.get("/transactions/export", params={"format": "parquet"})
+    assert response.status_code == status.HTTP_200_OK
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 25
+    assert table.column("amount").to_pylist() == list(range(25))
+    assert pq.ParquetFile(io.BytesIO(response.content)).num_row_groups == 7
+
+
+def test_parquet_export_without_pyarrow(client, monkeypatch):
+    monkeypatch.setattr(export, "load_pyarrow", lambda: (None, None))
+    response = client.get("/transactions/export", params={"format": "parquet"})
+    assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
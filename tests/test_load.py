@@ -0,0 +1,27 @@
+import asyncio
+from benchmarks.load import SeedConfig, compare, run_suite
+
+
+def stats(p95, throughput):
+    return {"count": 10, "errors": 0, "throughput": throughput, "mean_ms": p95,
+            "p50_ms": p95, "p95_ms": p95, "p99_ms": p95}
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"mixed": {"16": {"GET /clients/": stats(10, 100),
+                                             "POST /clients/": stats(10, 100)}}}}
+    current = {"results": {"mixed": {"16": {"GET /clients/": stats(11, 95),
+                                            "POST /clients/": stats(20, 50),
+                                            "GET /new": stats(99, 1)}}}}
+    regressions = compare(baseline, current, threshold=0.2)
+    assert len(regressions) == 2
+    assert all("POST /clients/" in regression for regression in regressions)
+
+
+def test_suite_runs_every_route(session):
+    report = asyncio.run(run_suite(SeedConfig(clients=50, plans=3),
+                                   ["mixed"], [4], requests=200))
+    routes = report["results"]["mixed"]["4"]
+    assert "GET /suscriptions/" in routes
+    assert sum(route["errors"] for route in routes.values()) == 0
+    assert compare(report, report, threshold=0.2) == []
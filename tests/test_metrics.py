@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.config import get_settings
+from app.metrics import RequestStats, current_request, instrument_engine
+
+payload = {"name": "Metered", "age": 30, "email": "metered@example.com"}
+
+
+def series(text: str, prefix: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+               if line.startswith(prefix))
+
+
+def test_metrics_by_route_template(client):
+    created = client.post("/clients/", json=payload).json()
+    client.get(f"/clients/{created['id']}")
+    client.get("/clients/999999")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert "http_requests_in_flight 1" in text
+    route = 'method="GET",route="/clients/{client_id}"'
+    assert series(text, f'http_request_duration_seconds_count{{{route},status="200"}}') >= 1
+    assert series(text, f'http_request_duration_seconds_count{{{route},status="404"}}') >= 1
+    assert f"/clients/{created['id']}" not in text
+    assert series(text, f"http_request_db_queries_sum{{{route}}}") >= 2
+
+
+def test_slow_request_log_includes_sql(client, caplog, monkeypatch):
+    monkeypatch.setattr(get_settings(), "slow_request_ms", 0.001)
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        client.post("/clients/", json=payload)
+    assert "Slow request POST /clients/" in caplog.text
+    assert "INSERT INTO client" in caplog.text
+
+
+def test_failed_statements_leave_no_timing_state():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        instrument_engine(engine)
+        token = current_request.set(RequestStats())
+        try:
+            async with engine.connect() as conn:
+                for _ in range(3):
+                    with pytest.raises(OperationalError):
+                        await conn.exec_driver_sql("SELECT * FROM missing")
+                await conn.exec_driver_sql("SELECT 1")
+                raw = await conn.get_raw_connection()
+                return current_request.get(), dict(raw.info)
+        finally:
+            current_request.reset(token)
+            await engine.dispose()
+
+    stats, info = asyncio.run(run())
+    assert stats.queries == 1
+    assert info == {}
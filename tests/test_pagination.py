@@ -0,0 +1,90 @@
+import json
+from fastapi import status
+from app.config import get_settings
+
+
+def create_clients(client, count):
+    for i in range(count):
+        response = client.post("/clients/", json={"name": f"Page {i}",
+                                                  "age": 20 + i,
+                                                  "email": f"page{i}@example.com"})
+        assert response.status_code == status.HTTP_200_OK
+
+
+def test_keyset_pagination(client):
+    create_clients(client, 5)
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["after"] = cursor
+        response = client.get("/clients/", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        seen += [c["id"] for c in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == sorted(seen)
+    assert len(seen) == 5
+
+
+def test_invalid_cursor(client):
+    response = client.get("/clients/", params={"after": "not-a-cursor"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_ndjson_stream(client):
+    create_clients(client, 3)
+    response = client.get("/clients/", params={"format": "ndjson"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["name"] for row in rows] == ["Page 0", "Page 1", "Page 2"]
+
+
+def test_fast_json_matches_default_path(client, monkeypatch):
+    create_clients(client, 3)
+    owner = client.get("/clients/").json()[0]
+    client.post("/transactions/", json={"amount": 5, "description": "fast",
+                                        "client_id": owner["id"]})
+    for path in ("/clients/", "/transactions/"):
+        default = client.get(path, params={"limit": 2})
+        monkeypatch.setattr(get_settings(), "fast_json", True)
+        fast = client.get(path, params={"limit": 2})
+        monkeypatch.setattr(get_settings(), "fast_json", False)
+        assert fast.headers["content-type"] == "application/json"
+        assert fast.json() == default.json()
+        assert fast.headers.get("X-Next-Cursor") == default.headers.get("X-Next-Cursor")
+
+
+def test_sparse_fields(client):
+    create_clients(client, 3)
+    response = client.get("/clients/", params={"fields": "name", "limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    page = response.json()
+    assert [set(row) for row in page] == [{"id", "name"}] * 2
+    assert response.headers.get("X-Next-Cursor")
+
+    detail = client.get(f"/clients/{page[0]['id']}", params={"fields": "email,age"})
+    assert detail.json() == {"id": page[0]["id"], "age": 20,
+                             "email": "page0@example.com"}
+    assert client.get("/clients/999999",
+                      params={"fields": "name"}).status_code == status.HTTP_404_NOT_FOUND
+
+    found = client.get("/clients/search", params={"q": "page", "fields": "name"}).json()
+    assert [set(row) for row in found] == [{"id", "name"}] * 3
+    lines = client.get("/clients/", params={"fields": "name", "format": "ndjson"}).text
+    assert [json.loads(line) for line in lines.splitlines()][0] == {
+        "id": page[0]["id"], "name": "Page 0"}
+
+    client.post("/transactions/", json={"amount": 5, "description": "sparse",
+                                        "client_id": page[0]["id"]})
+    assert client.get("/transactions/", params={"fields": "amount"}).json() == [
+        {"id": 1, "amount": 5}]
+
+
+def test_unknown_sparse_field(client):
+    response = client.get("/clients/", params={"fields": "name,password"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["query", "fields"]
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from sqlmodel import select
+from app.db import new_session
+from app.models import Client, ClientSuscription, Transaction
+from app.query_audit import FullScanError, full_scans, query_auditor
+
+
+def run_query(query):
+    async def run():
+        async with new_session() as session:
+            return (await session.exec(query)).all()
+    return asyncio.run(run())
+
+
+def test_router_queries_use_indexes(client):
+    created = client.post("/clients/", json={"name": "Audit", "age": 50,
+                                             "email": "audit@example.com"}).json()
+    client.post("/transactions/", json={"amount": 1, "description": "audit",
+                                        "client_id": created["id"]})
+    client.get("/clients/", params={"limit": 1})
+    client.get("/transactions/")
+    assert any("FROM client" in statement for statement in query_auditor.plans)
+
+    run_query(select(Transaction).where(Transaction.client_id == created["id"]))
+    run_query(select(ClientSuscription)
+              .where(ClientSuscription.client_id == created["id"])
+              .where(ClientSuscription.status == "active"))
+
+
+def test_full_scan_fails_loudly(client):
+    with pytest.raises(FullScanError, match="client"):
+        run_query(select(Client).where(Client.name == "Audit"))
+
+
+def test_materialized_subquery_scan_allowed(client):
+    ranked = (select(Client.id).where(Client.id > 0).order_by(Client.id.desc())
+              .limit(5).subquery())
+    run_query(select(Client).join(ranked, ranked.c.id == Client.id))
+
+
+@pytest.mark.parametrize("plan", [
+    # SQLite 3.36 and later
+    ["SCAN client", "SCAN t AS t2", "SCAN client USING INDEX ix_client_email",
+     "SEARCH transaction USING INDEX ix_transaction_client_id (client_id=?)",
+     "MATERIALIZE sub", "SCAN sub"],
+    # Before 3.36
+    ["SCAN TABLE client", "SCAN TABLE t AS t2",
+     "SCAN TABLE client USING INDEX ix_client_email",
+     "SEARCH TABLE transaction USING INDEX ix_transaction_client_id (client_id=?)",
+     "MATERIALIZE sub", "SCAN TABLE sub"],
+])
+def test_full_scans_in_both_plan_formats(plan):
+    assert full_scans(plan) == ["client", "t"]
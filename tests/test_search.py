@@ -0,0 +1,61 @@
+from fastapi import status
+
+people = [("Ana Gómez", 25, "ana@example.com"), ("Anabel Ruiz", 41, "abel@corp.io"),
+          ("Bruno Díaz", 33, "bruno@example.com"), ("Carla Ana", 58, "carla@corp.io")]
+
+
+def seed(client):
+    ids = {}
+    for name, age, email in people:
+        ids[email] = client.post("/clients/", json={"name": name, "age": age,
+                                                    "email": email}).json()["id"]
+    return ids
+
+
+def search(client, **params):
+    response = client.get("/clients/search", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    return [row["email"] for row in response.json()]
+
+
+def test_text_search_by_prefix_and_rank(client):
+    seed(client)
+    # Name matches rank above partial and email matches
+    assert search(client, q="ana")[0] in ("ana@example.com", "carla@corp.io")
+    assert set(search(client, q="ana")) == {"ana@example.com", "abel@corp.io",
+                                            "carla@corp.io"}
+    assert search(client, q="gomez") == ["ana@example.com"]
+    assert set(search(client, q="corp ana")) == {"carla@corp.io", "abel@corp.io"}
+    assert search(client, q='bru"no OR *') == []
+    assert search(client, q="bruno@exam") == ["bruno@example.com"]
+
+
+def test_filters_combine(client):
+    ids = seed(client)
+    plan = client.post("/suscriptions/", json={"name": "Pro", "price": 10}).json()
+    client.post(f"/clients/{ids['bruno@example.com']}/suscribe/{plan['id']}",
+                params={"suscription_status": "active"})
+    client.post(f"/clients/{ids['carla@corp.io']}/suscribe/{plan['id']}",
+                params={"suscription_status": "inactive"})
+
+    assert search(client, email="abel") == ["abel@corp.io"]
+    assert search(client, min_age=30, max_age=45) == ["abel@corp.io", "bruno@example.com"]
+    assert search(client, min_age=40) == ["abel@corp.io", "carla@corp.io"]
+    assert search(client, max_age=30) == ["ana@example.com"]
+    assert search(client, suscription_status="active") == ["bruno@example.com"]
+    assert search(client, q="ana", min_age=50) == ["carla@corp.io"]
+    assert search(client, limit=2, offset=1) == ["abel@corp.io", "bruno@example.com"]
+    # No word to match is no filter: a page of every client
+    assert search(client, q="?!", limit=1) == ["ana@example.com"]
+    for params in ({}, {"q": "ana"}, {"min_age": 50, "max_age": 60}):
+        response = client.get("/clients/search", params={"fields": "email", **params})
+        assert response.json()[-1] == {"id": ids["carla@corp.io"], "email": "carla@corp.io"}
+
+
+def test_index_follows_updates_and_deletes(client):
+    ids = seed(client)
+    client.patch(f"/clients/{ids['bruno@example.com']}", json={"name": "Zoe Díaz"})
+    assert search(client, q="bruno") == ["bruno@example.com"]  # still in the email
+    assert search(client, q="zoe") == ["bruno@example.com"]
+    client.delete(f"/clients/{ids['ana@example.com']}")
+    assert "ana@example.com" not in search(client, q="ana")
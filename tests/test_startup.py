@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+BENCH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                     "benchmarks", "bench_startup.py")
+
+
+def test_import_has_no_side_effects():
+    code = ("import sys; import main; from app import db; "
+            "assert db.get_engine.cache_info().currsize == 0; "
+            "assert 'pyarrow' not in sys.modules")
+    subprocess.run([sys.executable, "-c", code], check=True,
+                   cwd=os.path.dirname(os.path.dirname(BENCH)))
+
+
+def test_warm_start_skips_schema_creation(tmp_path):
+    # Timings are left to benchmarks/bench_startup.py --budget
+    sys.path.insert(0, os.path.dirname(BENCH))
+    try:
+        from bench_startup import boot, seed
+    finally:
+        sys.path.pop(0)
+    path = str(tmp_path / "startup.sqlite3")
+    assert boot(path)["schema_migrated"]
+    seed(path, 10)
+    assert not boot(path)["schema_migrated"]
+
+
+def test_schema_change_reruns_migration(client, session):
+    from main import app
+    assert app.state.schema_migrated
+    with client:
+        assert not app.state.schema_migrated
+
+    # An index the current models declare, missing from the database
+    session.exec(text("DROP INDEX ix_client_age"))
+    session.commit()
+    SQLModel.metadata.info["ddl"].append("-- a model change")
+    try:
+        with client:
+            assert app.state.schema_migrated
+    finally:
+        SQLModel.metadata.info["ddl"].pop()
+    indexes = [row[1] for row in session.exec(text("PRAGMA index_list(client)"))]
+    assert "ix_client_age" in indexes
@@ -0,0 +1,91 @@
+from fastapi import status
+
+
+def create_plan(client, name, price):
+    response = client.post("/suscriptions/", json={"name": name, "price": price})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_catalog_etag(client):
+    create_plan(client, "Basic", 10)
+    first = client.get("/suscriptions/")
+    assert first.status_code == status.HTTP_200_OK
+    etag = first.headers["ETag"]
+    assert [plan["name"] for plan in first.json()] == ["Basic"]
+
+    cached = client.get("/suscriptions/")
+    assert cached.headers["ETag"] == etag
+    assert cached.content == first.content
+
+    not_modified = client.get("/suscriptions/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not_modified.content == b""
+
+
+def test_catalog_invalidated_on_create(client):
+    create_plan(client, "Basic", 10)
+    etag = client.get("/suscriptions/").headers["ETag"]
+    create_plan(client, "Premium", 30)
+    response = client.get("/suscriptions/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert [plan["name"] for plan in response.json()] == ["Basic", "Premium"]
+
+
+def test_catalog_cache_keeps_pagination_headers(client):
+    for i in range(3):
+        create_plan(client, f"Plan {i}", i)
+    for _ in range(2):
+        response = client.get("/suscriptions/", params={"limit": 2})
+        assert len(response.json()) == 2
+        assert response.headers["X-Next-Cursor"]
+
+
+def subscribe(client, client_id, plan_id, suscription_status="active"):
+    response = client.post(f"/clients/{client_id}/suscribe/{plan_id}",
+                           params={"suscription_status": suscription_status})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_client_suscriptions_with_plan_details(client):
+    basic = create_plan(client, "Basic", 10)
+    premium = create_plan(client, "Premium", 30)
+    owner = client.post("/clients/", json={"name": "Sub", "age": 30,
+                                           "email": "sub@example.com"}).json()
+    subscribe(client, owner["id"], basic["id"], "inactive")
+    subscribe(client, owner["id"], premium["id"], "active")
+
+    response = client.get(f"/clients/{owner['id']}/suscriptions")
+    assert [(s["name"], s["status"]) for s in response.json()] == [
+        ("Basic", "inactive"), ("Premium", "active")]
+
+    response = client.get(f"/clients/{owner['id']}/suscriptions",
+                          params={"suscription_status": "active"})
+    assert [(s["name"], s["price"]) for s in response.json()] == [("Premium", 30)]
+
+    response = client.get("/clients/9999999/suscriptions")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_batch_client_suscriptions(client):
+    plan = create_plan(client, "Basic", 10)
+    ids = []
+    for i in range(3):
+        owner = client.post("/clients/", json={"name": f"Batch {i}", "age": 30,
+                                               "email": f"batch{i}@example.com"}).json()
+        ids.append(owner["id"])
+    subscribe(client, ids[0], plan["id"])
+    subscribe(client, ids[2], plan["id"], "inactive")
+
+    response = client.get("/clients/suscriptions",
+                          params={"ids": f"{ids[2]},{ids[0]},{ids[1]},9999999"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [c["client_id"] for c in data["clients"]] == [ids[2], ids[0], ids[1]]
+    assert [len(c["suscriptions"]) for c in data["clients"]] == [1, 1, 0]
+    assert data["missing"] == [9999999]
+
+    response = client.get("/clients/suscriptions", params={"ids": "1,x"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from fastapi import status
+from app.archive import archiver
+from app.auth import create_user
+from app.config import get_settings
+from app.db import tenant_engines
+from app.tenants import TENANT_HEADER, create_tenant, list_tenants, migrate_tenant
+
+ACME = {TENANT_HEADER: "acme"}
+GLOBEX = {TENANT_HEADER: "globex"}
+
+
+@pytest.fixture(name="tenants")
+def tenants_fixture(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "tenant_database_url",
+                        f"sqlite+aiosqlite:///{tmp_path}/{{tenant}}.sqlite3")
+
+    async def create():
+        for tenant in ("globex", "acme"):
+            await create_tenant(tenant)
+        # Engines are bound to this event loop, not the app's
+        await tenant_engines.dispose()
+
+    asyncio.run(create())
+    return ["acme", "globex"]
+
+
+def create(client, name, headers):
+    return client.post("/clients/", headers=headers,
+                       json={"name": name, "age": 30, "email": "same@example.com"})
+
+
+def test_requests_use_the_tenant_shard(tenants, client):
+    assert list_tenants() == tenants
+    acme = create(client, "Acme", ACME).json()
+    # Shards are separate databases: same id, same email
+    globex = create(client, "Globex", GLOBEX).json()
+    assert acme["id"] == globex["id"] == 1
+
+    assert client.get("/clients/1", headers=ACME).json()["name"] == "Acme"
+    assert client.get("/clients/1", headers=GLOBEX).json()["name"] == "Globex"
+    assert client.get("/clients/1").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/clients/", headers=ACME).json()[0]["name"] == "Acme"
+    assert client.get("/clients/").json() == []
+
+    assert client.get("/clients/", headers={TENANT_HEADER: "../x"}).status_code \
+        == status.HTTP_400_BAD_REQUEST
+    assert client.get("/clients/", headers={TENANT_HEADER: "initech"}).status_code \
+        == status.HTTP_404_NOT_FOUND
+
+
+def test_least_recently_used_engine_is_evicted(tenants, client, monkeypatch):
+    monkeypatch.setattr(tenant_engines, "maxsize", 1)
+    client.get("/clients/", headers=ACME)
+    client.get("/clients/", headers=GLOBEX)
+    assert "globex" in tenant_engines and "acme" not in tenant_engines
+    assert len(tenant_engines) == 1
+    create(client, "Acme", ACME)
+    assert client.get("/clients/", headers=ACME).json()[0]["name"] == "Acme"
+
+
+def test_admin_lists_merge_every_shard(tenants, client):
+    for n in range(3):
+        client.post("/clients/", headers=ACME,
+                    json={"name": f"A{n}", "age": 30, "email": f"a{n}@example.com"})
+    for n in range(2):
+        client.post("/clients/", headers=GLOBEX,
+                    json={"name": f"G{n}", "age": 30, "email": f"g{n}@example.com"})
+
+    seen, after = [], None
+    while True:
+        response = client.get("/admin/clients", params={"limit": 2, "after": after})
+        seen += [(row["id"], row["tenant"]) for row in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+    assert seen == [(1, "acme"), (1, "globex"), (2, "acme"), (2, "globex"), (3, "acme")]
+    assert client.get("/admin/clients", params={"after": "bad"}).status_code \
+        == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_admin_lists_reject_tenant_users(tenants, client, monkeypatch):
+    for tenant in (None, "acme"):
+        client.portal.call(create_user, "admin", "correct horse", tenant)
+    monkeypatch.setattr(get_settings(), "auth_enabled", True)
+    admin = ("admin", "correct horse")
+    assert client.get("/admin/clients", headers=ACME, auth=admin).status_code \
+        == status.HTTP_403_FORBIDDEN
+    assert client.get("/admin/clients", auth=admin).status_code == status.HTTP_200_OK
+
+
+def test_unauthenticated_requests_open_no_shard(tenants, client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_enabled", True)
+    for headers in (ACME, GLOBEX):
+        assert client.get("/clients/", headers=headers).status_code \
+            == status.HTTP_401_UNAUTHORIZED
+    assert len(tenant_engines) == 0
+    assert client.get("/clients/", headers={TENANT_HEADER: "initech"}).status_code \
+        == status.HTTP_404_NOT_FOUND
+
+
+def test_soft_delete_archives_in_the_tenant_shard(tenants, client):
+    acme = create(client, "Acme", ACME).json()
+    client.post("/transactions/", headers=ACME,
+                json={"amount": 1, "description": "tx", "client_id": acme["id"]})
+    client.delete(f"/clients/{acme['id']}", headers=ACME, params={"soft": True})
+    client.portal.call(archiver.join)
+    job = client.get(f"/clients/{acme['id']}/archive", headers=ACME).json()
+    assert (job["status"], job["archived"]) == ("completed", 1)
+
+
+def test_migrate_is_a_no_op_on_a_current_shard(tenants):
+    async def migrate():
+        try:
+            return await migrate_tenant("acme")
+        finally:
+            await tenant_engines.dispose()
+
+    assert asyncio.run(migrate()) is False
@@ -0,0 +1,75 @@
+from fastapi import status
+
+
+def create_client(client, email="ledger@example.com"):
+    response = client.post("/clients/", json={"name": "Ledger Client",
+                                              "age": 33,
+                                              "email": email})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_create_transaction(client):
+    client_data = create_client(client)
+    response = client.post("/transactions/", json={"amount": 150,
+                                                   "description": "Monthly fee",
+                                                   "client_id": client_data["id"]})
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["amount"] == 150
+    assert data["client_id"] == client_data["id"]
+
+    response = client.get("/transactions/")
+    assert response.status_code == status.HTTP_200_OK
+    assert [t["id"] for t in response.json()] == [data["id"]]
+
+
+def test_create_transaction_client_not_found(client):
+    response = client.post("/transactions/", json={"amount": 10,
+                                                   "description": "Orphan",
+                                                   "client_id": 9999999})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_duplicate_email_rejected(client):
+    create_client(client, email="taken@example.com")
+    response = client.post("/clients/", json={"name": "Other",
+                                              "age": 20,
+                                              "email": "taken@example.com"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["body", "email"]
+
+
+def test_balance_and_invoice(client):
+    client_data = create_client(client)
+    for amount in (100, 250):
+        client.post("/transactions/", json={"amount": amount, "description": "fee",
+                                            "client_id": client_data["id"]})
+    client.post("/transactions/bulk", json=[{"amount": 50, "description": "bulk",
+                                             "client_id": client_data["id"]}])
+
+    balance = client.get(f"/clients/{client_data['id']}/balance").json()
+    assert balance["balance"] == 400
+    assert balance["transaction_count"] == 3
+
+    response = client.post("/transactions/invoice/", json={"client_id": client_data["id"],
+                                                           "description": "October"})
+    assert response.status_code == status.HTTP_200_OK
+    invoice = response.json()
+    assert invoice["total_amount"] == 400
+    assert invoice["transaction_count"] == 3
+    assert invoice["client"]["email"] == client_data["email"]
+
+    # A range that ends before any transaction exists
+    response = client.post("/transactions/invoice/", json={"client_id": client_data["id"],
+                                                           "end": "2000-01-01T00:00:00Z"})
+    assert response.json()["total_amount"] == 0
+
+    response = client.post("/transactions/invoice/", json={"client_id": client_data["id"],
+                                                           "start": "2000-01-01T00:00:00Z"})
+    assert response.json()["total_amount"] == 400
+
+
+def test_invoice_client_not_found(client):
+    response = client.post("/transactions/invoice/", json={"client_id": 9999999})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
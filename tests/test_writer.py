@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from fastapi import status
+from fastapi.exceptions import RequestValidationError
+from fastapi.testclient import TestClient
+from sqlmodel import select
+from app.config import get_settings
+from app.db import new_session
+from app.emails import flush_client
+from app.models import Client
+from app.writer import WriteQueue, write_queue
+from main import app
+
+
+@pytest.fixture(name="writer_client")
+def writer_client_fixture(session, monkeypatch):
+    monkeypatch.setattr(get_settings(), "write_queue", True)
+    with TestClient(app) as client:
+        assert write_queue.running
+        yield client
+    assert not write_queue.running
+
+
+def insert_client(email):
+    async def op(session):
+        client = Client(name="Grouped", age=40, email=email)
+        session.add(client)
+        await flush_client(session, client)
+        return client
+    return op
+
+
+def test_concurrent_writes_share_one_commit(session):
+    async def run():
+        queue = WriteQueue(max_batch=100, max_delay_ms=50)
+        queue.start()
+        emails = [f"group{n}@example.com" for n in range(10)] + ["group0@example.com"]
+        results = await asyncio.gather(*(queue.submit(insert_client(email))
+                                         for email in emails), return_exceptions=True)
+        await queue.stop()
+        async with new_session() as check:
+            stored = (await check.exec(select(Client.email))).all()
+        return queue, results, stored
+
+    queue, results, stored = asyncio.run(run())
+    assert (queue.batches, queue.operations) == (1, 10)
+    assert all(isinstance(result, Client) and result.id for result in results[:10])
+    # The duplicate fails alone; the rest of the batch is committed
+    assert isinstance(results[10], RequestValidationError)
+    assert sorted(stored) == sorted(f"group{n}@example.com" for n in range(10))
+
+
+def test_routes_write_through_the_queue(writer_client):
+    operations = write_queue.operations
+    payload = {"name": "Queued", "age": 30, "email": "queued@example.com"}
+    created = writer_client.post("/clients/", json=payload)
+    assert created.status_code == status.HTTP_200_OK
+    client_id = created.json()["id"]
+    duplicate = writer_client.post("/clients/", json=payload)
+    assert duplicate.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    plan = writer_client.post("/suscriptions/", json={"name": "Basic", "price": 5}).json()
+    link = writer_client.post(f"/clients/{client_id}/suscribe/{plan['id']}",
+                              params={"suscription_status": "active"})
+    assert link.json()["client_id"] == client_id
+    transaction = writer_client.post("/transactions/", json={
+        "amount": 15, "description": "queued", "client_id": client_id})
+    assert transaction.status_code == status.HTTP_201_CREATED
+    assert transaction.json()["created_at"]
+    assert writer_client.get(f"/clients/{client_id}/balance").json()["balance"] == 15
+    assert write_queue.operations == operations + 3